@@ -0,0 +1,91 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from covers import is_cover_song, make_cover_catalog
+
+
+# Everything the stats.py plots need, computed in one pass over the setlists.
+# The Counters are filled in setlist order, so most_common() ties come out exactly
+# as they did when each plot built its own Counter.
+class ShowAggregates:
+    def __init__(self, song_counts, opener_counts, closer_counts, song_shows, dates,
+                 num_songs, locations, location_month_counts, cover_song_counts=None):
+        self.song_counts = song_counts
+        self.opener_counts = opener_counts
+        self.closer_counts = closer_counts
+        self.song_shows = song_shows
+        self.dates = dates
+        self.num_songs = num_songs
+        self.locations = locations
+        self.location_month_counts = location_month_counts
+        self.cover_song_counts = cover_song_counts
+
+        # Shows in date order, for the per-show plots
+        self.date_order = np.argsort(dates.to_numpy(), kind='stable')
+
+    @property
+    def num_shows(self):
+        return len(self.dates)
+
+    @property
+    def sorted_dates(self):
+        return self.dates.iloc[self.date_order]
+
+    @property
+    def sorted_num_songs(self):
+        return self.num_songs[self.date_order]
+
+    @property
+    def location_counts(self):
+        return self.locations.value_counts()
+
+    # 1 for every show (in original order) where the song was played, else 0
+    def song_played(self, song_name):
+        played = np.zeros(self.num_shows, dtype=int)
+        played[self.song_shows.get(song_name, [])] = 1
+        return played
+
+
+def compute_aggregates(df, cover_songs=None):
+    song_counts = Counter()
+    opener_counts = Counter()
+    closer_counts = Counter()
+    song_shows = {}
+
+    # The one pass over every setlist
+    for show, setlist in enumerate(df['setlist']):
+        song_counts.update(setlist)
+        if setlist:
+            opener_counts[setlist[0]] += 1
+            closer_counts[setlist[-1]] += 1
+        for song in setlist:
+            shows = song_shows.setdefault(song, [])
+            if not shows or shows[-1] != show:
+                shows.append(show)
+
+    dates = pd.to_datetime(df['date']).reset_index(drop=True)
+    locations = df['location'].reset_index(drop=True)
+    num_songs = np.array([len(setlist) for setlist in df['setlist']])
+
+    # Shows per location and month
+    location_month_counts = pd.crosstab(locations, dates.dt.month.rename('month'))
+    location_month_counts.index.name = 'location'
+
+    # Covers keep the order they were first played in, like get_cover_song_stats
+    cover_song_counts = None
+    if cover_songs is not None:
+        cover_catalog = make_cover_catalog(cover_songs)
+        cover_song_counts = Counter({song: count for song, count in song_counts.items()
+                                     if is_cover_song(song, cover_catalog)})
+
+    return ShowAggregates(song_counts, opener_counts, closer_counts, song_shows, dates,
+                          num_songs, locations, location_month_counts, cover_song_counts)
+
+
+# Let plot functions take either a dataframe or precomputed aggregates
+def as_aggregates(data):
+    if isinstance(data, ShowAggregates):
+        return data
+    return compute_aggregates(data)
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from html import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import setlistfm
+from crawler import Crawler, save_fixture, serve_fixtures
+
+SHOWS_PER_PAGE = 10
+LIST_PATH = "/setlists/widespread-panic-13d6ad15.html?page={page_num}"
+
+
+# Build a deterministic setlist.fm look-alike site out of the bundled XML
+def build_fixture_site(directory, xml_file, num_pages):
+    shows = []
+    for show in ET.parse(xml_file).getroot().iter('show'):
+        shows.append({
+            'location': show.findtext('location').strip(),
+            'date': show.findtext('date').strip(),
+            'setlist': [song.text.strip() for song in show.iter('song')]
+        })
+
+    fake_domain = "http://fixture"
+    for page_num in range(1, num_pages + 1):
+        page_shows = shows[(page_num - 1) * SHOWS_PER_PAGE:page_num * SHOWS_PER_PAGE]
+        links = []
+        for i, show in enumerate(page_shows):
+            show_path = f"/setlist/widespread-panic/show-{page_num}-{i}.html"
+            links.append(f'<a class="summary url" href="..{show_path}">{escape(show["location"])}</a>')
+
+            month, day, year = show['date'].replace(',', '').split()
+            songs = "".join(f'<li><a class="songLabel">{escape(song)}</a></li>' for song in show['setlist'])
+            show_page = (
+                f'<html><body><h1><a>Widespread Panic</a><a><span>{escape(show["location"])}</span></a></h1>'
+                f'<span class="month">{month}</span><span class="day">{day}</span><span class="year">{year}</span>'
+                f'<ul>{songs}</ul></body></html>'
+            )
+            save_fixture(directory, fake_domain + show_path, show_page.encode('utf-8'))
+
+        list_page = f'<html><body>{"".join(links)}</body></html>'
+        save_fixture(directory, fake_domain + LIST_PATH.format(page_num=page_num), list_page.encode('utf-8'))
+
+
+def run_crawl(base_url, num_pages, max_concurrency):
+    list_url = base_url + LIST_PATH
+    with Crawler(max_concurrency=max_concurrency, requests_per_second=0) as crawler:
+        start = time.perf_counter()
+        links = setlistfm.get_all_show_links(crawler, pages=range(1, num_pages + 1), list_url=list_url, domain=base_url)
+        shows = [show for show in crawler.map(lambda url, content: setlistfm.parse_show_data(content), links) if show is not None]
+        elapsed = time.perf_counter() - start
+
+    return num_pages + len(links), len(shows), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawl throughput against a local fixture server")
+    parser.add_argument('--xml', default='xml_files/allshows_setlistfm.xml')
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated per-request server latency in seconds")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_fixture_site(directory, args.xml, args.pages)
+        server, base_url = serve_fixtures(directory, latency=args.latency)
+
+        try:
+            for max_concurrency in args.concurrency:
+                num_requests, num_shows, elapsed = run_crawl(base_url, args.pages, max_concurrency)
+                print(f"concurrency={max_concurrency:3d}  requests={num_requests}  shows={num_shows}  "
+                      f"time={elapsed:.2f}s  pages/s={num_requests / elapsed:.1f}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import stats
+from covers import load_cover_catalog
+
+
+# The iterrows/apply row builders create_excel_with_show_data used before
+def legacy_show_data_frame(df):
+    all_rows = []
+    for index, row in df.iterrows():
+        for song in row['setlist']:
+            all_rows.append({'Location': row['location'], 'Date': row['date'], 'Song': song})
+
+    song_df = pd.DataFrame(all_rows)
+    song_counter = Counter(song_df['Song'])
+    song_df["Times Played"] = song_df['Song'].apply(lambda x: song_counter[x])
+    return song_df.sort_values(by='Times Played', ascending=False)
+
+
+# The iterrows/apply row builders create_excel_with_cover_songs used before
+def legacy_cover_song_frame(df, cover_catalog):
+    all_rows = []
+    last_three_show_dates = df['date'].head(3).tolist()
+
+    for index, row in df.iterrows():
+        recently_played = 0
+        for i in range(3):
+            if row['date'] == last_three_show_dates[i]:
+                recently_played = i + 1
+                break
+
+        for song in row['setlist']:
+            all_rows.append({
+                'Location': row['location'],
+                'Date': row['date'],
+                'Song': song,
+                'Song Type': 'Cover' if song.lower().strip() in cover_catalog else 'Original',
+                'Recently Played': recently_played
+            })
+
+    cover_song_df = pd.DataFrame(all_rows)
+    cover_song_df['Date'] = pd.to_datetime(cover_song_df['Date'], errors='coerce')
+    song_counter = Counter(cover_song_df['Song'])
+    cover_song_df["Times Played"] = cover_song_df['Song'].apply(lambda x: song_counter[x])
+    return cover_song_df.sort_values(by='Times Played', ascending=False)
+
+
+def measure(build, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = build()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rows per second for the Excel sheet builders")
+    parser.add_argument('--xml', default='xml_files/allshows_setlistfm.xml')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = stats.create_dataframe(stats.parse_xml(args.xml))
+    cover_catalog = load_cover_catalog()
+
+    cases = [
+        ('show data', lambda: legacy_show_data_frame(df), lambda: stats.build_show_data_frame(df)),
+        ('cover songs', lambda: legacy_cover_song_frame(df, cover_catalog), lambda: stats.build_cover_song_frame(df, cover_catalog))
+    ]
+
+    for name, legacy, vectorized in cases:
+        old, old_time = measure(legacy, args.repeat)
+        new, new_time = measure(vectorized, args.repeat)
+        same = old.reset_index(drop=True).equals(new.reset_index(drop=True))
+        print(f"{name:12s} rows={len(new)}  iterrows={len(old) / old_time:10,.0f} rows/s  "
+              f"vectorized={len(new) / new_time:10,.0f} rows/s  speedup={old_time / new_time:5.1f}x  identical={same}")
+
+
+if __name__ == "__main__":
+    main()
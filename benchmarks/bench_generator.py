@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from setlist_generator import load_generator
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how many candidate setlists the beam search generates per second")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--candidates', type=int, default=16, help="Setlists per search")
+    parser.add_argument('--noise', type=float, default=0.5)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generator = load_generator(args.xml)
+    print(f"Built generator over {len(generator.songs)} songs in {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"lengths {generator.lengths[0]}-{generator.lengths[-1]} (typical {generator.typical_length})")
+
+    # Stand-in played probabilities, skewed like the model's: most songs unlikely, a rotation likely
+    rng = np.random.default_rng(0)
+    played = rng.beta(0.3, 2.0, len(generator.songs))
+
+    for noise in (0.0, args.noise):
+        searches = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.seconds:
+            setlists = generator.generate(played, args.candidates, noise=noise, rng=rng)
+            searches += 1
+        elapsed = time.perf_counter() - start
+        assert all(len(set(songs)) == len(songs) for songs, _ in setlists)
+        print(f"  noise={noise:.1f}  {searches / elapsed:7.1f} searches/s  "
+              f"{searches * len(setlists) / elapsed:8.1f} setlists/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from setlist_index import load_index
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+
+
+# The setlist scans analysts wrote before, over chronological (date, location, setlist) rows
+def scan_with_all(shows, first, then):
+    return [i for i, (_, _, setlist) in enumerate(shows) if first in setlist and then in setlist]
+
+
+def scan_before(shows, first, then):
+    matches = []
+    for i, (_, _, setlist) in enumerate(shows):
+        if first in setlist and then in setlist and setlist.index(first) < len(setlist) - 1 - setlist[::-1].index(then):
+            matches.append(i)
+    return matches
+
+
+def scan_last_played(shows, song):
+    dates = [date for date, _, setlist in shows if song in setlist]
+    return dates[-1] if dates else None
+
+
+def scan_between(shows, start, end, location):
+    return [i for i, (date, venue, _) in enumerate(shows) if venue == location and start <= date <= end]
+
+
+# An index answer in the form the matching scan returns, so the two can be compared
+def as_scan_result(result):
+    if result is None:
+        return None
+    if isinstance(result, dict):
+        return result['date']
+    return [int(show) for show in result]
+
+
+def best_time(query, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare setlist scans with the inverted index")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--first', default='Space Wrangler')
+    parser.add_argument('--then', default='Porch Song')
+    parser.add_argument('--location', default='Red Rocks Amphitheatre, Morrison, CO, USA')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index(args.xml)
+    print(f"Built index over {index.num_shows} shows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    setlists = index.store.setlists()
+    locations = index.store.locations()
+    shows = [(pd.Timestamp(date), locations[row], setlists[row]) for date, row in zip(index.dates, index.show_rows)]
+    window = (pd.Timestamp('2000-01-01'), pd.Timestamp('2010-12-31'))
+
+    queries = [
+        ('A and B', lambda: scan_with_all(shows, args.first, args.then),
+                    lambda: index.shows_with_all(args.first, args.then)),
+        ('A before B', lambda: scan_before(shows, args.first, args.then),
+                       lambda: index.shows_where_before(args.first, args.then)),
+        ('last played', lambda: scan_last_played(shows, args.then),
+                        lambda: index.last_played(args.then)),
+        ('dates x venue', lambda: scan_between(shows, *window, args.location),
+                          lambda: index.shows_between(*window, args.location))
+    ]
+
+    for name, scan, indexed in queries:
+        assert as_scan_result(indexed()) == scan(), f"{name}: index and scan disagree"
+        scan_time = best_time(scan, max(args.repeat // 20, 3))
+        index_time = best_time(indexed, args.repeat)
+        print(f"  {name:14s} scan={scan_time * 1e6:9.1f} us  index={index_time * 1e6:7.1f} us  "
+              f"speedup={scan_time / index_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
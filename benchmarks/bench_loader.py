@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from show_loader import iter_shows, load_columns
+
+XML_FILES = [
+    'xml_files/allshows_setlistfm.xml',
+    'xml_files/allshows_setlistfm_2008.xml',
+    'xml_files/allshows.xml'
+]
+
+
+# The BeautifulSoup loader stats.parse_xml / predictions.load_xml_data used before
+def load_with_beautifulsoup(xml_file):
+    with open(xml_file, 'r', encoding='utf-8') as file:
+        soup = BeautifulSoup(file, 'lxml-xml')
+
+        shows = []
+        for show in soup.find_all('show'):
+            shows.append({
+                'date': show.find('date').get_text(),
+                'location': show.find('location').get_text(),
+                'setlist': [song.get_text() for song in show.find_all('song')]
+            })
+
+    return len(shows)
+
+
+def load_with_columns(xml_file):
+    return len(load_columns(xml_file)['date'])
+
+
+# Generator mode: nothing is kept around, so memory doesn't grow with the file
+def load_with_generator(xml_file):
+    return sum(1 for _ in iter_shows(xml_file))
+
+
+def measure(loader, xml_file, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_shows = loader(xml_file)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    loader(xml_file)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return num_shows, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the XML show loaders")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('files', nargs='*', default=XML_FILES)
+    args = parser.parse_args()
+
+    loaders = [
+        ('beautifulsoup', load_with_beautifulsoup),
+        ('iterparse columns', load_with_columns),
+        ('iterparse generator', load_with_generator)
+    ]
+
+    for xml_file in args.files:
+        print(f"{xml_file} ({os.path.getsize(xml_file) / 1e6:.1f} MB)")
+        baseline = None
+        for name, loader in loaders:
+            num_shows, elapsed, peak = measure(loader, xml_file, args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {name:20s} shows={num_shows:5d}  time={elapsed * 1000:8.1f} ms  "
+                  f"speedup={baseline / elapsed:5.1f}x  peak={peak / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+import predictions
+
+
+# The per-(show, song) dict explosion train_model used before
+def legacy_training_data(df, all_songs):
+    rows = []
+    for index, row in df.iterrows():
+        played_songs = set(row['setlist'])
+        for song in all_songs:
+            rows.append({
+                'location_encoded': row['location_encoded'],
+                'days_since_last_show': row['days_since_last_show'],
+                'song': song,
+                'played': 1 if song in played_songs else 0
+            })
+    train_df = pd.DataFrame(rows)
+    return train_df[['location_encoded', 'days_since_last_show']], train_df['played']
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    X, Y = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(Y), int(Y.sum()), elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and peak memory of building the training matrix")
+    parser.add_argument('--xml', default='xml_files/allshows_setlistfm.xml')
+    args = parser.parse_args()
+
+    df, _ = predictions.preprocess_data(predictions.load_xml_data(args.xml))
+    all_songs = df['setlist'].explode().dropna().unique()
+
+    for name, build in [('dict rows', lambda: legacy_training_data(df, all_songs)),
+                        ('sparse/numpy', lambda: predictions.build_training_data(df, all_songs))]:
+        num_rows, num_played, elapsed, peak = measure(build)
+        print(f"{name:12s} rows={num_rows}  played={num_played}  time={elapsed:6.2f}s  peak={peak / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
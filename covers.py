@@ -1,10 +1,6 @@
-import requests
-from bs4 import BeautifulSoup
-import re
-from tqdm import tqdm
-import matplotlib.pyplot as plt
-import pandas as pd
-from collections import Counter
+from functools import lru_cache
+
+COVERS_FILE = 'txt_files/all_covers.txt'
 
 def read_file(file_path):
     with open(file_path,'r') as f:
@@ -12,7 +8,31 @@ def read_file(file_path):
 
     return songs
 
+# Cover titles are matched case-insensitively, ignoring surrounding whitespace
+def normalize_song(song):
+    return song.lower().strip()
+
+# Build the set of normalized cover titles (a frozenset is passed through untouched)
+def make_cover_catalog(cover_songs):
+    if isinstance(cover_songs, frozenset):
+        return cover_songs
+    return frozenset(normalize_song(song) for song in cover_songs)
+
+# Read the cover list once per process and share it
+@lru_cache(maxsize=None)
+def load_cover_catalog(file_path=COVERS_FILE):
+    return make_cover_catalog(read_file(file_path))
+
+def is_cover_song(song, catalog):
+    return normalize_song(song) in catalog
+
+# Label a whole column of song titles at once: True where the song is a cover
+def label_cover_songs(songs, catalog):
+    import pandas as pd
+    songs = pd.Series(songs, dtype=object)
+    return songs.str.lower().str.strip().isin(catalog)
+
 if __name__ == "__main__":
     file = "all_covers.txt"
     songs = read_file(file)
-    print(songs)
\ No newline at end of file
+    print(songs)
@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+JOURNAL_PATH = os.path.join('cache', 'crawl_journal.jsonl')
+
+
+# Append-only checkpoint of every show link we have discovered and every show page
+# that has been parsed, so an interrupted or repeated crawl only fetches what it hasn't seen
+class CrawlJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.links = []
+        self.known_links = set()
+        self.shows = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write can leave a partial last line
+                    continue
+
+                if 'show' in record:
+                    self.shows[record['url']] = record['show']
+                else:
+                    self.links.append(record['url'])
+                    self.known_links.add(record['url'])
+
+    def __contains__(self, url):
+        return url in self.shows
+
+    def __len__(self):
+        return len(self.shows)
+
+    def _write(self, records):
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+
+    def is_known(self, url):
+        return url in self.known_links or url in self.shows
+
+    # Remember links found on the listing pages before fetching them
+    def add_links(self, urls):
+        new_urls = [url for url in dict.fromkeys(urls) if not self.is_known(url)]
+        self.links.extend(new_urls)
+        self.known_links.update(new_urls)
+        self._write({'url': url} for url in new_urls)
+
+    # Links that were discovered on an earlier run but never parsed
+    def pending_links(self):
+        return [url for url in self.links if url not in self.shows]
+
+    def add_show(self, url, show):
+        self.shows[url] = show
+        self._write([{'url': url, 'show': show}])
+
+    # All journaled shows, newest first like the setlist.fm listing
+    def all_shows(self):
+        return sorted(self.shows.values(), key=show_sort_key, reverse=True)
+
+
+def show_sort_key(show):
+    try:
+        return datetime.strptime(show['date'], '%b %d, %Y')
+    except ValueError:
+        return datetime.min
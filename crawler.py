@@ -0,0 +1,178 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+# Default crawl settings
+MAX_CONCURRENCY = 8
+REQUESTS_PER_SECOND = 4.0
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+TIMEOUT = 30
+USER_AGENT = "WSP-Project crawler (+https://github.com/Brseale/WSP-Project)"
+
+
+# Spaces out requests to the same host so we never exceed requests_per_second
+class HostRateLimiter:
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+
+        # Reserve the next free slot for this host, then sleep outside the lock
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# Thread-pooled crawler that shares one pooled HTTP session across all workers
+class Crawler:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, requests_per_second=REQUESTS_PER_SECOND,
+                 max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, timeout=TIMEOUT, cache=None):
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+
+        # Retry connection errors and throttling/server errors with exponential backoff
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url):
+        headers = self.cache.conditional_headers(url) if self.cache else {}
+
+        self.rate_limiter.wait(urlparse(url).netloc)
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        # Page hasn't changed since we cached it
+        if response.status_code == 304 and self.cache:
+            content = self.cache.read(url)
+            if content is not None:
+                return content
+            self.rate_limiter.wait(urlparse(url).netloc)
+            response = self.session.get(url, timeout=self.timeout)
+
+        response.raise_for_status()
+        if self.cache:
+            self.cache.store(url, response.content, response.headers)
+        return response.content
+
+    # Fetch every url concurrently and yield parse(url, content) for each, in input order.
+    # A page that still fails after the retries (404, exhausted 5xx, connection error) is
+    # logged and yields None, so one bad page doesn't cost the rest of the crawl.
+    def imap(self, parse, urls, desc=None):
+        def fetch_and_parse(url):
+            try:
+                content = self.fetch(url)
+            except requests.RequestException as e:
+                print(f"Warning: skipping {url}: {e}")
+                return None
+            return parse(url, content)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = [pool.submit(fetch_and_parse, url) for url in urls]
+            for future in tqdm(futures, desc=desc, disable=desc is None):
+                yield future.result()
+
+    def map(self, parse, urls, desc=None):
+        return list(self.imap(parse, urls, desc))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Map a request path (including the query string) to a flat fixture file name
+def fixture_filename(path):
+    return quote(path.lstrip('/'), safe='') or 'index.html'
+
+
+# Serves pre-recorded pages from a directory so crawls can be benchmarked offline
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+        file_path = os.path.join(self.directory, fixture_filename(self.path))
+        if not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        with open(file_path, 'rb') as f:
+            body = f.read()
+
+        # Support revalidation so cached crawls can be benchmarked too
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Start a local fixture server on a free port and return (server, base_url)
+def serve_fixtures(directory, latency=0.0, port=0):
+    handler = type('Handler', (FixtureRequestHandler,), {'latency': latency})
+
+    def make_handler(*args, **kwargs):
+        return handler(*args, directory=directory, **kwargs)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+
+# Record a page into a fixture directory under the name the fixture server will look up
+def save_fixture(directory, url, content):
+    parsed = urlparse(url)
+    path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    with open(os.path.join(directory, fixture_filename(path)), 'wb') as f:
+        f.write(content)
@@ -0,0 +1,88 @@
+import os
+
+CHUNK_SIZE = 10000
+DATE_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+# Yield the dataframe as lists of plain Python rows, chunk_size rows at a time
+def iter_row_chunks(df, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield chunk.values.tolist()
+
+
+# xlsxwriter in constant_memory mode flushes each row to disk as soon as the next one starts
+def _write_xlsx_xlsxwriter(xlsxwriter, df, path, sheet_title, header, chunk_size):
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'default_date_format': DATE_FORMAT})
+    ws = workbook.add_worksheet(sheet_title)
+
+    row_num = 0
+    if header:
+        ws.write_row(row_num, 0, list(df.columns))
+        row_num += 1
+
+    for rows in iter_row_chunks(df, chunk_size):
+        for row in rows:
+            ws.write_row(row_num, 0, row)
+            row_num += 1
+
+    workbook.close()
+
+
+# openpyxl write-only worksheets stream rows out instead of keeping every cell around
+def _write_xlsx_openpyxl(df, path, sheet_title, header, chunk_size):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+
+    if header:
+        ws.append(list(df.columns))
+
+    for rows in iter_row_chunks(df, chunk_size):
+        for row in rows:
+            ws.append(row)
+
+    wb.save(path)
+
+
+# Stream a dataframe into a single-sheet workbook, with the fastest engine installed
+def write_xlsx(df, path, sheet_title, header=True, chunk_size=CHUNK_SIZE):
+    try:
+        import xlsxwriter
+    except ImportError:
+        _write_xlsx_openpyxl(df, path, sheet_title, header, chunk_size)
+    else:
+        _write_xlsx_xlsxwriter(xlsxwriter, df, path, sheet_title, header, chunk_size)
+    return path
+
+
+def write_csv(df, path, header=True):
+    df.to_csv(path, index=False, header=header)
+    return path
+
+
+# Parquet needs pyarrow or fastparquet; skip it when neither is installed
+def write_parquet(df, path):
+    try:
+        df.to_parquet(path, index=False)
+    except ImportError:
+        print(f"Skipping {path}: install pyarrow or fastparquet for parquet output")
+        return None
+    return path
+
+
+# Write the same table as xlsx plus csv/parquet siblings that share its base name
+def export_table(df, xlsx_path, sheet_title, header=True, formats=('xlsx', 'csv', 'parquet')):
+    base_path = os.path.splitext(xlsx_path)[0]
+    written = []
+
+    if 'xlsx' in formats:
+        written.append(write_xlsx(df, xlsx_path, sheet_title, header=header))
+    if 'csv' in formats:
+        written.append(write_csv(df, base_path + '.csv', header=header))
+    if 'parquet' in formats:
+        written.append(write_parquet(df, base_path + '.parquet'))
+
+    return [path for path in written if path]
@@ -0,0 +1,224 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from show_store import drop_duplicate_shows, load_store, store_path, store_to_dataframe
+
+FEATURE_VERSION = 4
+
+# How many previous shows the rolling play rate looks at
+RATE_WINDOW = 20
+RECENT_WINDOW = 3
+
+FEATURE_NAMES = ['shows_since_played', 'play_rate', 'played_last_3']
+
+
+# Per-(show, song) features, shows oldest first. Row i only uses shows before show i,
+# so the features can be fed to a model without leaking the setlist being predicted.
+#   shows_since_played: shows since the song was last played (i + 1 if never before)
+#   play_rate: fraction of the previous RATE_WINDOW shows that had the song
+#   played_last_3: 1 if the song was in any of the previous 3 shows
+class FeatureStore:
+    def __init__(self, songs, show_keys, arrays, last_played):
+        self.songs = songs
+        self.song_index = {song: i for i, song in enumerate(songs)}
+        self.show_keys = show_keys
+        self.show_index = {key: i for i, key in enumerate(show_keys)}
+        self.played = arrays['played']
+        self.shows_since_played = arrays['shows_since_played']
+        self.play_rate = arrays['play_rate']
+        self.played_last_3 = arrays['played_last_3']
+        self.last_played = last_played
+
+    @property
+    def num_shows(self):
+        return len(self.show_keys)
+
+    def feature_arrays(self):
+        return [self.shows_since_played, self.play_rate, self.played_last_3]
+
+    # Features for (show, song) pairs picked out by row and column index, as (shows, songs, features)
+    def take(self, show_rows, song_cols):
+        return np.stack([array[np.ix_(show_rows, song_cols)] for array in self.feature_arrays()], axis=-1)
+
+    # What the features will be for the show after the newest one, as (songs, features)
+    def next_show_features(self):
+        gap, rate, recent, _ = compute_features(
+            np.zeros((1, len(self.songs)), dtype=np.uint8), self.num_shows, self.last_played, self.tail())
+        return np.stack([gap[0], rate[0], recent[0]], axis=-1)
+
+    # The last few rows of the played matrix, all compute_features needs to extend the features
+    def tail(self):
+        return self.played[max(self.num_shows - max(RATE_WINDOW, RECENT_WINDOW), 0):]
+
+
+# Compute features for a block of new shows from cumulative sums, given the state left by
+# the shows before them: last_played (global index per song, -1 = never) and the last few
+# rows of the played matrix (tail)
+def compute_features(new_played, first_index, last_played, tail):
+    num_new = len(new_played)
+    num_tail = len(tail)
+
+    block = np.vstack([tail, new_played]).astype(np.int32)
+    csum = np.zeros((len(block) + 1, block.shape[1]), dtype=np.int32)
+    np.cumsum(block, axis=0, out=csum[1:])
+
+    # Row r of the block is preceded by block rows [0, r)
+    rows = np.arange(num_tail, num_tail + num_new)
+    rate_start = np.maximum(rows - RATE_WINDOW, 0)
+    rate = (csum[rows] - csum[rate_start]) / np.maximum(rows - rate_start, 1)[:, None]
+    recent = (csum[rows] - csum[np.maximum(rows - RECENT_WINDOW, 0)]) > 0
+
+    # Running max of "index of the show the song was played at" gives the last play before each show
+    show_index = first_index + np.arange(num_new)
+    marks = np.where(new_played > 0, show_index[:, None], -1)
+    running = np.maximum.accumulate(np.vstack([last_played[None, :], marks]), axis=0)
+    before = running[:-1]
+    gap = np.where(before >= 0, show_index[:, None] - before, show_index[:, None] + 1)
+
+    return gap.astype(np.int32), rate.astype(np.float32), recent.astype(np.uint8), running[-1]
+
+
+def feature_dir(xml_file):
+    return os.path.join(store_path(xml_file), 'features')
+
+
+# Rows of a show dataframe (XML order, newest first) oldest first, without undated shows,
+# and the "date|location" key of each
+def chronological_rows(df):
+    df = df.reset_index(drop=True).dropna(subset=['date'])
+    df = df.iloc[::-1].sort_values('date', kind='stable')
+    keys = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d') + '|' + df['location']
+    return df.index.to_numpy(), keys.tolist()
+
+
+# Shows from the XML oldest first, as (show keys, setlists). Repeated listings of a show are
+# dropped first, so the keys are unique.
+def chronological_shows(xml_file):
+    df = drop_duplicate_shows(store_to_dataframe(load_store(xml_file)))
+    rows, keys = chronological_rows(df)
+    return keys, df['setlist'].iloc[rows].tolist()
+
+
+def save_feature_store(store, path):
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    arrays = {
+        'played': store.played,
+        'shows_since_played': store.shows_since_played,
+        'play_rate': store.play_rate,
+        'played_last_3': store.played_last_3,
+        'last_played': store.last_played
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': FEATURE_VERSION, 'songs': store.songs, 'show_keys': store.show_keys}, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_feature_store(path, mmap=True):
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != FEATURE_VERSION:
+        return None
+
+    arrays = {}
+    for name in ('played', 'shows_since_played', 'play_rate', 'played_last_3', 'last_played'):
+        arrays[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+    return FeatureStore(meta['songs'], meta['show_keys'], arrays, np.asarray(arrays['last_played']))
+
+
+def empty_feature_store():
+    arrays = {
+        'played': np.zeros((0, 0), dtype=np.uint8),
+        'shows_since_played': np.zeros((0, 0), dtype=np.int32),
+        'play_rate': np.zeros((0, 0), dtype=np.float32),
+        'played_last_3': np.zeros((0, 0), dtype=np.uint8)
+    }
+    return FeatureStore([], [], arrays, np.zeros(0, dtype=np.int64))
+
+
+# Grow every array to cover songs that first appear in the new shows
+def _add_songs(store, num_songs):
+    grow = num_songs - store.played.shape[1]
+    if not grow:
+        return store
+
+    num_shows = store.num_shows
+    never_played = (np.arange(num_shows, dtype=np.int32) + 1)[:, None].repeat(grow, axis=1)
+    arrays = {
+        'played': np.hstack([store.played, np.zeros((num_shows, grow), dtype=np.uint8)]),
+        'shows_since_played': np.hstack([store.shows_since_played, never_played]),
+        'play_rate': np.hstack([store.play_rate, np.zeros((num_shows, grow), dtype=np.float32)]),
+        'played_last_3': np.hstack([store.played_last_3, np.zeros((num_shows, grow), dtype=np.uint8)])
+    }
+    last_played = np.concatenate([store.last_played, np.full(grow, -1, dtype=np.int64)])
+    return FeatureStore(store.songs, store.show_keys, arrays, last_played)
+
+
+# Bring the feature store up to date with the XML, computing rows only for shows it
+# doesn't have yet. Falls back to a full rebuild if an older show turns up.
+def update_feature_store(xml_file):
+    path = feature_dir(xml_file)
+    keys, setlists = chronological_shows(xml_file)
+
+    store = load_feature_store(path, mmap=False) or empty_feature_store()
+    new_rows = [i for i, key in enumerate(keys) if key not in store.show_index]
+    if not new_rows:
+        return store
+
+    if new_rows[0] < store.num_shows:
+        store = empty_feature_store()
+        new_rows = list(range(len(keys)))
+
+    # Extend the song vocabulary and mark which songs each new show had
+    songs = list(store.songs)
+    song_index = dict(store.song_index)
+    played_ids = []
+    for i in new_rows:
+        ids = []
+        for song in setlists[i]:
+            if song not in song_index:
+                song_index[song] = len(songs)
+                songs.append(song)
+            ids.append(song_index[song])
+        played_ids.append(ids)
+
+    store.songs = songs
+    store = _add_songs(store, len(songs))
+
+    new_played = np.zeros((len(new_rows), len(songs)), dtype=np.uint8)
+    for row, ids in enumerate(played_ids):
+        new_played[row, ids] = 1
+
+    gap, rate, recent, last_played = compute_features(new_played, store.num_shows, store.last_played, store.tail())
+
+    arrays = {
+        'played': np.vstack([store.played, new_played]),
+        'shows_since_played': np.vstack([store.shows_since_played, gap]),
+        'play_rate': np.vstack([store.play_rate, rate]),
+        'played_last_3': np.vstack([store.played_last_3, recent])
+    }
+    store = FeatureStore(songs, store.show_keys + [keys[i] for i in new_rows], arrays, last_played)
+
+    save_feature_store(store, path)
+    return store
+
+
+if __name__ == "__main__":
+    import time
+    start = time.perf_counter()
+    store = update_feature_store('xml_files/allshows_setlistfm.xml')
+    print(f"{store.num_shows} shows x {len(store.songs)} songs in {time.perf_counter() - start:.2f}s")
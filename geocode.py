@@ -0,0 +1,157 @@
+import csv
+import os
+import sqlite3
+
+GEOCODE_DB = os.path.join('cache', 'geocode.sqlite')
+GAZETTEER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'txt_files', 'gazetteer.csv')
+
+USER_AGENT = 'location_mapper'
+
+# Nominatim's usage policy allows one request per second
+NOMINATIM_DELAY = 1.0
+
+
+# Looks locations up on OpenStreetMap's Nominatim. geopy is only imported when this is used.
+class NominatimGeocoder:
+    name = 'nominatim'
+
+    # Every answer costs a rate-limited request, so each one is committed as it arrives
+    checkpoint_every = 1
+
+    def __init__(self, user_agent=USER_AGENT, min_delay_seconds=NOMINATIM_DELAY, timeout=10):
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+
+        geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+        self._geocode = RateLimiter(geolocator.geocode, min_delay_seconds=min_delay_seconds, swallow_exceptions=False)
+
+    # (latitude, longitude), or (None, None) if Nominatim doesn't know the place.
+    # Network errors are raised so they don't get cached as misses.
+    def geocode(self, location_name):
+        location = self._geocode(location_name)
+        if location:
+            return location.latitude, location.longitude
+        return None, None
+
+
+# Offline lookup against a small bundled table of state/province and country centroids.
+# "Venue, City, GA, USA" resolves to the middle of Georgia; good enough for test runs
+# and for a map without network access.
+class GazetteerGeocoder:
+    name = 'gazetteer'
+
+    # Lookups are free, so results are committed in large batches instead of per row
+    checkpoint_every = 500
+
+    def __init__(self, path=GAZETTEER_FILE):
+        self.places = {}
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                self.places[row['place'].casefold()] = (float(row['latitude']), float(row['longitude']))
+
+    def geocode(self, location_name):
+        parts = [part.strip() for part in location_name.split(',')]
+
+        # Most specific match first: "GA, USA" before "USA"
+        for size in (2, 1):
+            if len(parts) >= size:
+                place = ', '.join(parts[-size:]).casefold()
+                if place in self.places:
+                    return self.places[place]
+        return None, None
+
+
+GEOCODERS = {
+    NominatimGeocoder.name: NominatimGeocoder,
+    GazetteerGeocoder.name: GazetteerGeocoder
+}
+
+
+# Geocoder instance from a backend name, or an existing geocoder passed straight through
+def make_geocoder(geocoder=None):
+    if geocoder is None:
+        geocoder = NominatimGeocoder.name
+    if isinstance(geocoder, str):
+        if geocoder not in GEOCODERS:
+            raise ValueError(f"unknown geocoder {geocoder!r} (choose from {', '.join(GEOCODERS)})")
+        return GEOCODERS[geocoder]()
+    return geocoder
+
+
+# location -> coordinates, remembered on disk per backend. Places the backend couldn't
+# find are stored too (as NULL) so they aren't looked up again either.
+class GeocodeCache:
+    def __init__(self, path=GEOCODE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS locations ('
+            ' location TEXT NOT NULL,'
+            ' source TEXT NOT NULL,'
+            ' latitude REAL,'
+            ' longitude REAL,'
+            ' PRIMARY KEY (location, source))'
+        )
+        self.conn.commit()
+
+    # {location: (latitude, longitude)} for the locations already cached for this source
+    def get_many(self, locations, source):
+        found = {}
+        locations = list(locations)
+
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(locations), 500):
+            chunk = locations[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f'SELECT location, latitude, longitude FROM locations WHERE source = ? AND location IN ({placeholders})',
+                [source] + chunk)
+            for location, latitude, longitude in rows:
+                found[location] = (latitude, longitude)
+        return found
+
+    def put(self, location, source, coordinates):
+        self.put_many([(location, coordinates)], source)
+
+    # Insert (location, coordinates) pairs in one transaction
+    def put_many(self, items, source):
+        self.conn.executemany('INSERT OR REPLACE INTO locations VALUES (?, ?, ?, ?)',
+                              [(location, source) + tuple(coordinates) for location, coordinates in items])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Coordinates for every distinct location, asking the geocoder only about ones that
+# aren't cached yet. Results are committed every `checkpoint_every` lookups (every one
+# for Nominatim), so an interrupted run keeps everything it already paid for.
+def geocode_locations(locations, geocoder=None, cache_path=GEOCODE_DB, progress=None):
+    geocoder = make_geocoder(geocoder)
+    unique_locations = list(dict.fromkeys(locations))
+
+    with GeocodeCache(cache_path) as cache:
+        coordinates = cache.get_many(unique_locations, geocoder.name)
+        missing = [location for location in unique_locations if location not in coordinates]
+
+        if progress:
+            missing = progress(missing)
+        checkpoint_every = getattr(geocoder, 'checkpoint_every', 1)
+        pending = []
+        for location in missing:
+            coordinates[location] = tuple(geocoder.geocode(location))
+            pending.append((location, coordinates[location]))
+            if len(pending) >= checkpoint_every:
+                cache.put_many(pending, geocoder.name)
+                pending = []
+        if pending:
+            cache.put_many(pending, geocoder.name)
+
+    return coordinates
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import threading
+
+CACHE_DIR = os.path.join('cache', 'http')
+
+
+# On-disk HTTP cache: page bodies are stored by content hash, and an append-only
+# index maps each URL to its body plus the validators needed to revalidate it
+class HTTPCache:
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write can leave a partial last line
+                    continue
+                self.entries[entry['url']] = entry
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    # Headers that let the server answer 304 Not Modified for a page we already have
+    def conditional_headers(self, url):
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+
+        path = self._object_path(entry['digest'])
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def store(self, url, content, headers=None):
+        headers = headers or {}
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+
+        # Identical bodies are only written once
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        entry = {
+            'url': url,
+            'digest': digest,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified')
+        }
+        with self.lock:
+            self.entries[url] = entry
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
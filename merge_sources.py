@@ -0,0 +1,356 @@
+import argparse
+import csv
+import re
+import time
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from show_loader import iter_shows
+from symbols import normalize_name, normalize_set_name, split_segue
+from xml_writer import ShowXMLWriter
+
+OUTPUT_XML = 'xml_files/allshows_merged.xml'
+
+# (name, path, loader), best source first: where sources disagree on a setlist the
+# earliest one with songs wins, and set headings are borrowed from later ones
+SOURCES = [
+    ('setlistfm', 'xml_files/allshows_setlistfm.xml', 'xml'),
+    ('setlistfm_2008', 'xml_files/allshows_setlistfm_2008.xml', 'xml'),
+    ('band_site', 'xml_files/allshows.xml', 'xml'),
+    ('band_site_sets', 'csv_files/widespread_panic_shows.csv', 'band_site_csv'),
+    ('band_site_csv', 'csv_files/structured_shows.csv', 'structured_csv')
+]
+
+# Same-date shows whose venues don't normalize to the same key are only merged
+# when their setlists are at least this similar (or one of them has no songs)
+MIN_SETLIST_SIMILARITY = 0.6
+
+# Venue keys and setlist entries that only say the source didn't know
+UNKNOWN_VENUES = {'', 'n/a', 'na', 'unknown location'}
+PLACEHOLDER_SONGS = {'No setlist available'}
+
+# Spelling variants inside venue names
+VENUE_WORDS = {'theatre': 'theater', 'amphitheatre': 'amphitheater', 'centre': 'center', 'ctr': 'center'}
+
+# "2024-06-23T18:00:00-04:00" -> "2024-06-23": the show's local date, whatever the offset
+ISO_TIMESTAMP = re.compile(r"^(\d{4}-\d{2}-\d{2})T")
+
+# setlist.fm, band site and ISO dates
+DATE_FORMATS = ('%b %d, %Y', '%B %d, %Y', '%Y-%m-%d')
+
+# Band site set labels: "I", "II", "E", "E2", "E II", with stray colons and quotes
+SET_LABEL = re.compile(r"^\s*([^:]*):+\s?(.*)$")
+SONG_NUMBER = re.compile(r"^(\d+)")
+
+# Songs are "<number><title>" joined by commas; only split where a number follows, so
+# titles like "Weak Brain, Narrow Mind" stay whole
+SONG_SPLIT = re.compile(r",\s*(?=\d+\D)")
+
+
+# Venue join key: just the venue part of "Venue, City, ST, Country", normalized,
+# so "The Riverside Theatre" and "Riverside Theater, Milwaukee, WI, USA" agree
+def venue_key(location):
+    words = normalize_name(location.split(',')[0]).split()
+    if words[:1] == ['the']:
+        words = words[1:]
+    return ' '.join(VENUE_WORDS.get(word, word) for word in words)
+
+
+# Parse a column of date strings in any of the sources' formats; unparseable -> NaT.
+# Each known format is one vectorized pass; only leftovers go through the slow mixed parser.
+def normalize_dates(dates):
+    dates = pd.Series(dates, dtype=object).fillna('').astype(str).str.strip()
+    dates = dates.str.replace(ISO_TIMESTAMP, r'\1', regex=True)
+
+    parsed = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[ns]')
+    for date_format in DATE_FORMATS:
+        missing = parsed.isna()
+        parsed[missing] = pd.to_datetime(dates[missing], format=date_format, errors='coerce')
+    missing = parsed.isna() & ~dates.isin(['', 'N/A', 'Unknown date'])
+    if missing.any():
+        parsed[missing] = pd.to_datetime(dates[missing], format='mixed', errors='coerce')
+    return parsed.dt.normalize()
+
+
+def _set_label_name(label):
+    label = label.strip(' :"')
+    if label.casefold().startswith(('set', 'encore')):
+        return normalize_set_name(label)
+    if label[:1].upper() == 'E':
+        return normalize_set_name(f"Encore {label[1:].strip()}")
+    return normalize_set_name(f"Set {label}") if label else ''
+
+
+# One band site setlist cell. Each "I: 1A, 2B, ..." line holds its own set followed by
+# every later set (an old scraper bug), but song numbers restart at 1 with every set,
+# so a line's own set is everything before the numbering resets.
+def parse_band_site_setlist(text):
+    setlist = []
+    sets = []
+    for line in text.split('\n'):
+        match = SET_LABEL.match(line)
+        if not match or not match.group(2).strip():
+            continue
+
+        songs = []
+        for item in SONG_SPLIT.split(match.group(2)):
+            expected = str(len(songs) + 1)
+            if item.startswith(expected):
+                songs.append(item[len(expected):])
+                continue
+
+            # The numbering going back means the next set started; a gap (the site
+            # sometimes skips numbers) is just a song
+            number = SONG_NUMBER.match(item)
+            if songs and number and int(number.group(1)) < len(songs) + 1:
+                break
+            title = item[number.end():] if number else item
+            if songs and not title.strip():
+                # A title with ", <digits>" in it was split anyway; put it back together
+                songs[-1] += ', ' + item
+            else:
+                songs.append(title)
+
+        setlist.extend(song.strip() for song in songs)
+        sets.append((_set_label_name(match.group(1)), len(songs)))
+
+    return setlist, sets
+
+
+def load_xml_source(path):
+    return list(iter_shows(path))
+
+
+def load_band_site_csv(path):
+    shows = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            setlist, sets = parse_band_site_setlist(row['setlist'])
+            shows.append({'date': row['date'], 'location': row['location'], 'setlist': setlist, 'sets': sets})
+    return shows
+
+
+def load_structured_csv(path):
+    shows = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            setlist = [song.strip() for song in row['Setlist'].split(', ')
+                       if song.strip() and song.strip() not in PLACEHOLDER_SONGS]
+            shows.append({'date': row['Date'], 'location': row['Location'], 'setlist': setlist})
+    return shows
+
+
+LOADERS = {'xml': load_xml_source, 'band_site_csv': load_band_site_csv, 'structured_csv': load_structured_csv}
+
+
+# Every show from every source as one frame, with its join key (date, venue key).
+# Undated shows and empty shows at unknown venues carry nothing to merge and are dropped.
+def load_records(sources=SOURCES):
+    frames = []
+    for priority, (name, path, loader) in enumerate(sources):
+        shows = LOADERS[loader](path)
+        frame = pd.DataFrame({
+            'source': name,
+            'priority': priority,
+            'raw_date': [show['date'] for show in shows],
+            'location': [show['location'].strip() for show in shows],
+            'setlist': [[split_segue(song)[0] for song in show['setlist']] for show in shows],
+            'segues': [show.get('segues') or [split_segue(song)[1] for song in show['setlist']] for show in shows],
+            'sets': [show.get('sets') or [] for show in shows]
+        })
+        frames.append(frame)
+
+    records = pd.concat(frames, ignore_index=True)
+    records['date'] = normalize_dates(records['raw_date'])
+    venue_keys = {location: venue_key(location) for location in records['location'].unique()}
+    records['venue_key'] = records['location'].map(venue_keys)
+    records['num_songs'] = records['setlist'].str.len()
+
+    empty_unknown = (records['num_songs'] == 0) & records['venue_key'].isin(UNKNOWN_VENUES)
+    records = records[records['date'].notna() & ~empty_unknown]
+
+    # Within a source, keep the fullest copy of each show; the other copies are returned
+    # separately so the merge report can list them
+    records = records.sort_values(['priority', 'num_songs'], ascending=[True, False], kind='stable')
+    duplicate = records.duplicated(['source', 'date', 'venue_key'])
+    return records[~duplicate].reset_index(drop=True), records[duplicate].reset_index(drop=True)
+
+
+def setlist_keys(setlist):
+    return [normalize_name(song) for song in setlist]
+
+
+def setlist_similarity(a, b):
+    return SequenceMatcher(None, setlist_keys(a), setlist_keys(b), autojunk=False).ratio()
+
+
+# Join records into shows. The join is a hash group-by on (date, venue key); then, only on
+# dates left with more than one show, shows from disjoint sources whose setlists agree are
+# joined too, which catches venues the sources name differently.
+def cluster_records(records, min_similarity=MIN_SETLIST_SIMILARITY):
+    records = records.copy()
+    records['show'] = records.groupby(['date', 'venue_key'], sort=False).ngroup()
+
+    shows_per_date = records.groupby('date')['show'].nunique()
+    crowded = records[records['date'].isin(shows_per_date.index[shows_per_date > 1])]
+    rows = crowded[['source', 'priority', 'setlist', 'num_songs', 'show']].to_dict('index')
+    show = records['show'].to_numpy(copy=True)
+
+    for _, on_date in crowded.groupby('date', sort=False).groups.items():
+        clusters = {}
+        for i in on_date:
+            clusters.setdefault(rows[i]['show'], []).append(i)
+        order = sorted(clusters, key=lambda cluster: min(rows[i]['priority'] for i in clusters[cluster]))
+
+        for n, cluster in enumerate(order):
+            b = clusters[cluster]
+            for other in order[:n]:
+                a = clusters.get(other)
+                if a is None or {rows[i]['source'] for i in a} & {rows[i]['source'] for i in b}:
+                    continue
+                best_a = max(a, key=lambda i: rows[i]['num_songs'])
+                best_b = max(b, key=lambda i: rows[i]['num_songs'])
+                if min(rows[best_a]['num_songs'], rows[best_b]['num_songs']) == 0 or \
+                        setlist_similarity(rows[best_a]['setlist'], rows[best_b]['setlist']) >= min_similarity:
+                    show[b] = other
+                    clusters[other] = a + b
+                    del clusters[cluster]
+                    break
+
+    records['show'] = show
+    return records
+
+
+# Map set boundaries from `other` onto `setlist` through the matching blocks of a sequence
+# diff, so headings taken from one source land on the right songs of another's setlist
+def project_sets(setlist, other, other_sets):
+    matcher = SequenceMatcher(None, setlist_keys(other), setlist_keys(setlist), autojunk=False)
+    position = {}
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            position[block.a + k] = block.b + k
+
+    # Each set starts where its first matched song landed
+    starts = []
+    start = 0
+    for name, num_songs in other_sets:
+        matched = [position[i] for i in range(start, start + num_songs) if i in position]
+        if matched:
+            starts.append((max(matched[0], starts[-1][0] if starts else 0), name))
+        start += num_songs
+    if not starts:
+        return []
+
+    starts[0] = (0, starts[0][1])
+    ends = [begin for begin, _ in starts[1:]] + [len(setlist)]
+    return [(name, end - begin) for (begin, name), end in zip(starts, ends) if end > begin]
+
+
+# Fill gaps in `setlist` from `other`: songs the diff says `other` has and `setlist` lacks
+# (pure inserts) are added in place; where the two disagree, `setlist` wins. Segue flags
+# follow their songs.
+def fill_setlist(setlist, segues, other, other_segues):
+    matcher = SequenceMatcher(None, setlist_keys(setlist), setlist_keys(other), autojunk=False)
+    merged, merged_segues = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'insert':
+            merged.extend(other[j1:j2])
+            merged_segues.extend(other_segues[j1:j2])
+        else:
+            merged.extend(setlist[i1:i2])
+            merged_segues.extend(segues[i1:i2])
+    return merged, merged_segues
+
+
+# One canonical show out of every source's copy of it (row dicts, best source first).
+# The best source with songs gives the setlist; other sources that agree with it fill in
+# songs it missed, and set headings come from the first source that has them.
+def reconcile(rows, min_similarity=MIN_SETLIST_SIMILARITY):
+    with_songs = [row for row in rows if row['num_songs']]
+    primary = with_songs[0] if with_songs else rows[0]
+    setlist, segues = primary['setlist'], list(primary['segues'])
+
+    # The most specific location ("Venue, City, ST, Country" beats "Venue")
+    location = max((row['location'] for row in rows), key=lambda location: location.count(','))
+
+    similarities = []
+    for row in with_songs[1:]:
+        similarity = setlist_similarity(primary['setlist'], row['setlist'])
+        similarities.append(similarity)
+        if similarity >= min_similarity and row['num_songs'] > len(setlist):
+            setlist, segues = fill_setlist(setlist, segues, row['setlist'], row['segues'])
+
+    named = [row for row in with_songs if any(name for name, _ in row['sets'])]
+    sets = project_sets(setlist, named[0]['setlist'], named[0]['sets']) if named else []
+
+    date = primary['date']
+    return {
+        'date': f"{date:%b} {date.day}, {date.year}",
+        'location': location,
+        'setlist': setlist,
+        'sets': sets,
+        'segues': segues,
+        'sources': sorted({row['source'] for row in rows}),
+        'similarity': min(similarities) if similarities else None,
+        'added_songs': len(setlist) - primary['num_songs']
+    }
+
+
+def merge_sources(sources=SOURCES, min_similarity=MIN_SETLIST_SIMILARITY):
+    records, duplicates = load_records(sources)
+    records = cluster_records(records, min_similarity)
+
+    # Newest show first, like every other show XML; best source first within a show
+    records = records.sort_values(['date', 'show', 'priority'], ascending=[False, True, True], kind='stable')
+    rows = records[['source', 'date', 'location', 'setlist', 'segues', 'sets', 'num_songs']].to_dict('records')
+    shows = [reconcile([rows[i] for i in positions], min_similarity)
+             for positions in records.groupby('show', sort=False).indices.values()]
+    return shows, records, duplicates
+
+
+# Per-source counts (including same-day copies dropped within a source), how often the
+# copies of a show agreed, and the dropped copies that disagreed with the kept one
+def merge_report(shows, records, duplicates):
+    by_source = records.sort_values('priority', kind='stable').groupby('source', sort=False).agg(records=('show', 'size'), shows=('show', 'nunique'))
+    only = pd.Series([show['sources'][0] for show in shows if len(show['sources']) == 1]).value_counts()
+    by_source['only_source'] = only.reindex(by_source.index, fill_value=0)
+    by_source['duplicates_dropped'] = duplicates['source'].value_counts().reindex(by_source.index, fill_value=0)
+
+    # Dropped copies whose setlist isn't the same as the one that was kept
+    keys = ['source', 'date', 'venue_key']
+    kept = records.set_index(keys)['setlist'].reindex(pd.MultiIndex.from_frame(duplicates[keys]))
+    conflicts = duplicates[[dropped != kept for dropped, kept in zip(duplicates['setlist'], kept)]]
+
+    similarities = pd.Series([show['similarity'] for show in shows], dtype=float).dropna()
+    return by_source, similarities, conflicts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge every show source into one canonical XML file")
+    parser.add_argument('--out', default=OUTPUT_XML)
+    parser.add_argument('--min-similarity', type=float, default=MIN_SETLIST_SIMILARITY,
+                        help="Setlist similarity needed to join same-date shows at differently named venues")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    shows, records, duplicates = merge_sources(min_similarity=args.min_similarity)
+    with ShowXMLWriter(args.out) as writer:
+        writer.write_shows(shows)
+    elapsed = time.perf_counter() - start
+
+    by_source, similarities, conflicts = merge_report(shows, records, duplicates)
+    print(f"Merged {len(records)} records into {len(shows)} shows -> {args.out} in {elapsed:.1f}s")
+    print(by_source.to_string())
+    print(f"{len(similarities)} shows in more than one source with songs; setlist similarity "
+          f"median {similarities.median():.2f}, {int((similarities < 0.9).sum())} below 0.90")
+    print(f"{sum(show['added_songs'] for show in shows)} songs filled in from lower-priority sources, "
+          f"{sum(1 for show in shows if any(name for name, _ in show['sets']))} shows with set headings")
+    print(f"{len(duplicates)} same-day duplicate records dropped within their source, keeping the copy with the "
+          f"most songs; {len(conflicts)} had a different setlist:")
+    for row in conflicts.sort_values('date').itertuples():
+        print(f"  {row.source}: {row.date:%Y-%m-%d} {row.location} ({row.num_songs} songs)")
+
+
+if __name__ == "__main__":
+    main()
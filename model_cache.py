@@ -0,0 +1,92 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+import joblib
+
+MODEL_DIR = os.path.join('cache', 'models')
+
+# Bump whenever the features or training change so older artifacts are ignored
+MODEL_VERSION = 7
+
+
+# Fingerprint of the show data a model was trained on
+def data_hash(df):
+    hasher = hashlib.sha256()
+    for date, location, setlist in zip(df['date'].astype(str), df['location'], df['setlist']):
+        hasher.update('\x1e'.join([date, location, '\x1f'.join(setlist)]).encode('utf-8'))
+        hasher.update(b'\x1d')
+    return hasher.hexdigest()
+
+
+def model_path(key, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f"v{MODEL_VERSION}", f"{key}.joblib")
+
+
+# Trained artifacts for this data, or None if they haven't been trained yet
+def load_model(key, model_dir=MODEL_DIR):
+    path = model_path(key, model_dir)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+
+def save_model(key, artifacts, model_dir=MODEL_DIR):
+    path = model_path(key, model_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    artifacts = dict(artifacts, version=MODEL_VERSION, data_hash=key, trained_at=time.time())
+
+    # Write then rename so a reader never loads a half-written model
+    tmp_path = path + '.tmp'
+    joblib.dump(artifacts, tmp_path)
+    os.replace(tmp_path, path)
+    return artifacts
+
+
+# Cheap fingerprint of the XML file itself: unchanged mtime and size means unchanged shows
+def source_signature(xml_file):
+    stat = os.stat(xml_file)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def sources_path(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f"v{MODEL_VERSION}", 'sources.json')
+
+
+def _load_sources(model_dir=MODEL_DIR):
+    try:
+        with open(sources_path(model_dir), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Data hash recorded for this XML file, or None if the file changed since it was recorded.
+# Lets an unchanged file find its model without being parsed and hashed again.
+def cached_data_hash(xml_file, model_dir=MODEL_DIR):
+    entry = _load_sources(model_dir).get(os.path.abspath(xml_file))
+    if entry is None or entry['signature'] != source_signature(xml_file):
+        return None
+    return entry['data_hash']
+
+
+def remember_data_hash(xml_file, signature, key, model_dir=MODEL_DIR):
+    sources = _load_sources(model_dir)
+    sources[os.path.abspath(xml_file)] = {'signature': signature, 'data_hash': key}
+
+    path = sources_path(model_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sources, f)
+    os.replace(tmp_path, path)
+
+
+# Drop artifacts for older data, keeping the newest `keep` models
+def prune_models(keep=3, model_dir=MODEL_DIR):
+    paths = sorted(glob.glob(os.path.join(model_dir, f"v{MODEL_VERSION}", '*.joblib')), key=os.path.getmtime)
+    for path in paths[:-keep]:
+        os.remove(path)
@@ -0,0 +1,155 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.model_selection import ParameterGrid, ParameterSampler, TimeSeriesSplit
+
+from feature_store import update_feature_store
+from predictions import build_feature_matrix, build_play_matrix, load_xml_data, lookup_song_features, make_classifier, preprocess_data
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+TOP_N = 20
+N_SPLITS = 3
+
+# Default grid searched by main()
+PARAM_GRID = {
+    'n_estimators': [50, 100],
+    'max_depth': [None, 12],
+    'min_samples_leaf': [1, 5]
+}
+
+
+# Show-level arrays every fold is cut from, ordered oldest show first so each fold
+# only ever trains on shows that happened before its test shows
+def prepare_data(xml_file, max_shows=None):
+    # Gaps are computed over every show, the same way train_model sees them, before
+    # any cut to the most recent shows
+    df, _ = preprocess_data(load_xml_data(xml_file))
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    if max_shows:
+        df = df.tail(max_shows).reset_index(drop=True)
+
+    all_songs = df['setlist'].explode().dropna().unique()
+    song_index = {song: i for i, song in enumerate(all_songs)}
+
+    # Rotation features only look at earlier shows, so they are safe to use in every fold
+    features = update_feature_store(xml_file)
+
+    return {
+        'location_encoded': df['location_encoded'].to_numpy(),
+        'days_since_last_show': df['days_since_last_show'].to_numpy(),
+        'song_features': lookup_song_features(features, df, all_songs),
+        'play_matrix': build_play_matrix(df['setlist'], song_index),
+        'num_songs': len(all_songs)
+    }
+
+
+# Time-ordered folds over show positions: train on [0, k), test on the block after it
+def time_ordered_folds(num_shows, n_splits=N_SPLITS):
+    return list(TimeSeriesSplit(n_splits=n_splits).split(np.arange(num_shows)))
+
+
+# Mean fraction of each test show's songs that land in the model's top_n
+def top_n_hit_rate(clf, data, shows, top_n=TOP_N):
+    num_songs = data['num_songs']
+    X = build_feature_matrix(data['location_encoded'][shows], data['days_since_last_show'][shows], num_songs,
+                             data['song_features'][shows])
+    probabilities = clf.predict_proba(X)[:, 1].reshape(len(shows), num_songs)
+
+    top_n = min(top_n, num_songs)
+    top_songs = np.argpartition(-probabilities, top_n - 1, axis=1)[:, :top_n]
+
+    played = data['play_matrix'][shows].toarray().astype(bool)
+    hits = np.take_along_axis(played, top_songs, axis=1).sum(axis=1)
+    num_played = played.sum(axis=1)
+
+    has_songs = num_played > 0
+    return float(np.mean(hits[has_songs] / num_played[has_songs])) if has_songs.any() else 0.0
+
+
+# Cross-validate one configuration. Runs in a worker process, so the peak RSS of
+# that process is this configuration's peak memory.
+def evaluate_config(params, data, folds, top_n=TOP_N, n_jobs=1):
+    num_songs = data['num_songs']
+    start = time.perf_counter()
+    hit_rates = []
+
+    for train_shows, test_shows in folds:
+        X = build_feature_matrix(data['location_encoded'][train_shows], data['days_since_last_show'][train_shows], num_songs,
+                                 data['song_features'][train_shows])
+        Y = data['play_matrix'][train_shows].toarray().ravel()
+
+        clf = make_classifier(n_jobs=n_jobs, **params)
+        clf.fit(X, Y)
+        hit_rates.append(top_n_hit_rate(clf, data, test_shows, top_n))
+
+    return {
+        'params': params,
+        'hit_rate': float(np.mean(hit_rates)),
+        'fold_hit_rates': hit_rates,
+        'seconds': time.perf_counter() - start,
+        'peak_mb': peak_memory_mb()
+    }
+
+
+# Peak resident memory of this process; ru_maxrss is in KB on Linux but bytes on macOS.
+# The resource module is Unix-only, so elsewhere this reports NaN.
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Evaluate every configuration in its own process, using all cores between them.
+# max_tasks_per_child needs Python 3.11+; older versions reuse workers, so each config's
+# peak_mb is then the high-water mark of every config its worker ran so far.
+def search(data, configs, n_splits=N_SPLITS, top_n=TOP_N, max_workers=None):
+    folds = time_ordered_folds(len(data['location_encoded']), n_splits)
+    max_workers = min(max_workers or os.cpu_count(), len(configs))
+
+    # Cores left over when there are fewer configs than cores go to building trees
+    tree_jobs = max(1, os.cpu_count() // max_workers)
+
+    pool_options = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=max_workers, **pool_options) as pool:
+        futures = [pool.submit(evaluate_config, params, data, folds, top_n, tree_jobs) for params in configs]
+        results = [future.result() for future in futures]
+
+    return sorted(results, key=lambda result: result['hit_rate'], reverse=True)
+
+
+def print_report(results, top_n=TOP_N):
+    print(f"{'hit@' + str(top_n):>8s} {'time':>8s} {'peak':>9s}  params")
+    for result in results:
+        print(f"{result['hit_rate']:8.3f} {result['seconds']:7.1f}s {result['peak_mb']:7.0f}MB  {result['params']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time-ordered cross-validated search over setlist model settings")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--splits', type=int, default=N_SPLITS)
+    parser.add_argument('--top-n', type=int, default=TOP_N)
+    parser.add_argument('--max-shows', type=int, default=None, help="Only use the most recent N shows")
+    parser.add_argument('--random', type=int, default=0, help="Sample this many configs instead of the full grid")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    data = prepare_data(args.xml, args.max_shows)
+    if args.random:
+        configs = list(ParameterSampler(PARAM_GRID, n_iter=args.random, random_state=42))
+    else:
+        configs = list(ParameterGrid(PARAM_GRID))
+
+    print(f"Evaluating {len(configs)} configurations over {args.splits} time-ordered folds...")
+    results = search(data, configs, args.splits, args.top_n, args.workers)
+    print_report(results, args.top_n)
+
+
+if __name__ == "__main__":
+    main()
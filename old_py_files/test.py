@@ -1,3 +1,5 @@
+import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 import re
@@ -6,6 +8,9 @@ import matplotlib.pyplot as plt
 import pandas as pd
 from collections import Counter
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from xml_writer import ShowXMLWriter
+
 # Base URL template to plug in years
 base_list_url = "https://widespreadpanic.com/shows/past/?sf_paged={page_num}"
 
@@ -58,35 +63,8 @@ def get_show_data(show_url):
     }
 
 def save_to_xml(show_data):
-    # Create a new BeautifulSoup object for building XML using lxml-xml parser
-    soup = BeautifulSoup('<?xml version="1.0" encoding="UTF-8"?>', 'lxml-xml')
-    # Create the root element
-    wsp_data = soup.new_tag('wsp_data')
-    soup.append(wsp_data)
-
-    for show in show_data:
-        show_tag = soup.new_tag('show')
-
-        location = soup.new_tag('location')
-        location.string = show['location']
-
-        date = soup.new_tag('date')
-        date.string = show['date']
-
-        setlist = soup.new_tag('setlist')
-        if show['setlist']:
-            for song_title in show['setlist']:
-                song = soup.new_tag('song')
-                song.string = song_title
-                setlist.append(song)
-
-        show_tag.append(location)
-        show_tag.append(date)
-        show_tag.append(setlist)
-        wsp_data.append(show_tag)
-    
-    with open('allshows.xml', 'w', encoding='utf-8') as f:
-        f.write(soup.prettify())
+    with ShowXMLWriter('allshows.xml') as writer:
+        writer.write_shows(show_data)
 
 def main():
     all_show_links = get_all_show_links()
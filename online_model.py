@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from predictions import load_xml_data
+from show_store import store_path
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+
+# Weight of the newest show in the rolling play rate (~ the last 1/DECAY shows matter most)
+DECAY = 0.05
+
+# Scoring weights: rolling rate, how often the song is played at this venue, and how
+# much to hold back songs that were just played
+LOCATION_WEIGHT = 0.5
+REPEAT_PENALTY = 0.5
+REPEAT_WINDOW = 2
+
+
+# Running per-song frequency/recency statistics. Each new show updates them in O(songs),
+# so refreshing after a scrape only touches the shows added since the last run.
+class OnlineSongModel:
+    def __init__(self):
+        self.songs = []
+        self.song_index = {}
+        self.play_count = np.zeros(0)
+        self.play_rate = np.zeros(0)
+        self.last_played = np.zeros(0, dtype=np.int64)
+        self.location_plays = {}
+        self.location_shows = {}
+        self.num_shows = 0
+        self.last_date = None
+        self.last_date_keys = []
+
+    def _song_ids(self, setlist):
+        ids = []
+        for song in setlist:
+            song_id = self.song_index.get(song)
+            if song_id is None:
+                song_id = len(self.songs)
+                self.song_index[song] = song_id
+                self.songs.append(song)
+            ids.append(song_id)
+
+        # Grow the per-song arrays for songs we haven't seen before
+        grow = len(self.songs) - len(self.play_count)
+        if grow:
+            self.play_count = np.concatenate([self.play_count, np.zeros(grow)])
+            self.play_rate = np.concatenate([self.play_rate, np.zeros(grow)])
+            self.last_played = np.concatenate([self.last_played, np.full(grow, -1, dtype=np.int64)])
+
+        return np.unique(np.array(ids, dtype=np.int64))
+
+    # Fold one show into the statistics; shows must arrive oldest first
+    def add_show(self, location, setlist):
+        played = self._song_ids(setlist)
+
+        self.play_rate *= 1 - DECAY
+        self.play_rate[played] += DECAY
+        self.play_count[played] += 1
+        self.last_played[played] = self.num_shows
+
+        counts = self.location_plays.setdefault(location, {})
+        for song_id in played.tolist():
+            counts[song_id] = counts.get(song_id, 0) + 1
+        self.location_shows[location] = self.location_shows.get(location, 0) + 1
+
+        self.num_shows += 1
+
+    # Add only the shows in df that are newer than anything already folded in
+    def update(self, df):
+        df = df.dropna(subset=['date']).sort_values('date', kind='stable')
+        keys = show_keys(df)
+
+        if self.last_date is not None:
+            last_date = pd.Timestamp(self.last_date)
+            is_new = (df['date'] > last_date) | ((df['date'] == last_date) & ~keys.isin(self.last_date_keys))
+            df, keys = df[is_new], keys[is_new]
+
+        for location, setlist in zip(df['location'], df['setlist']):
+            self.add_show(location, setlist)
+
+        if len(df):
+            newest = df['date'].iloc[-1]
+            if self.last_date is not None and newest == pd.Timestamp(self.last_date):
+                self.last_date_keys += keys[df['date'] == newest].tolist()
+            else:
+                self.last_date_keys = keys[df['date'] == newest].tolist()
+            self.last_date = newest.isoformat()
+
+        return len(df)
+
+    def scores(self, location):
+        scores = self.play_rate.copy()
+
+        # Songs this venue has heard often get a boost
+        if location in self.location_shows:
+            location_rate = np.zeros(len(self.songs))
+            counts = self.location_plays[location]
+            location_rate[list(counts)] = list(counts.values())
+            scores += LOCATION_WEIGHT * location_rate / self.location_shows[location]
+
+        # Songs from the last couple of shows are unlikely to come straight back
+        just_played = self.last_played >= self.num_shows - REPEAT_WINDOW
+        scores[just_played] *= 1 - REPEAT_PENALTY
+        return scores
+
+    def predict(self, location, max_songs=20):
+        scores = self.scores(location)
+        max_songs = min(max_songs, len(scores))
+        if max_songs < 1:
+            return []
+        top = np.argpartition(-scores, max_songs - 1)[:max_songs]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [self.songs[i] for i in top]
+
+    # Written to a temporary directory and swapped in, so a crash mid-save never leaves
+    # state.json and arrays.npz from different runs
+    def save(self, state_dir):
+        tmp_path = state_dir + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.savez(os.path.join(tmp_path, 'arrays.npz'), play_count=self.play_count,
+                 play_rate=self.play_rate, last_played=self.last_played)
+
+        state = {
+            'songs': self.songs,
+            'location_plays': {location: {str(k): v for k, v in counts.items()}
+                               for location, counts in self.location_plays.items()},
+            'location_shows': self.location_shows,
+            'num_shows': self.num_shows,
+            'last_date': self.last_date,
+            'last_date_keys': self.last_date_keys
+        }
+        with open(os.path.join(tmp_path, 'state.json'), 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+
+        shutil.rmtree(state_dir, ignore_errors=True)
+        os.replace(tmp_path, state_dir)
+
+    @classmethod
+    def load(cls, state_dir):
+        model = cls()
+        state_file = os.path.join(state_dir, 'state.json')
+        if not os.path.exists(state_file):
+            return model
+
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        arrays = np.load(os.path.join(state_dir, 'arrays.npz'))
+
+        model.songs = state['songs']
+        model.song_index = {song: i for i, song in enumerate(model.songs)}
+        model.play_count = arrays['play_count']
+        model.play_rate = arrays['play_rate']
+        model.last_played = arrays['last_played']
+        model.location_plays = {location: {int(k): v for k, v in counts.items()}
+                                for location, counts in state['location_plays'].items()}
+        model.location_shows = state['location_shows']
+        model.num_shows = state['num_shows']
+        model.last_date = state['last_date']
+        model.last_date_keys = state['last_date_keys']
+        return model
+
+
+# Identify a show by its date and venue
+def show_keys(df):
+    return df['date'].astype(str) + '|' + df['location'].astype(str)
+
+
+# Saved statistics live next to the XML's show store, one directory per XML file
+def state_dir(xml_file):
+    return os.path.join(store_path(xml_file), 'online_model')
+
+
+# Load the saved statistics, fold in any new shows and save them again
+def refresh(xml_file=XML_FILE):
+    path = state_dir(xml_file)
+    model = OnlineSongModel.load(path)
+    num_new = model.update(load_xml_data(xml_file))
+    if num_new:
+        model.save(path)
+    return model, num_new
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally updated setlist predictor")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--location', default="Enmarket Arena, Savannah, GA, USA")
+    parser.add_argument('--max-songs', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    model, num_new = refresh(args.xml)
+    predicted_songs = model.predict(args.location, args.max_songs)
+    elapsed = time.perf_counter() - start
+
+    print(f"Folded in {num_new} new shows ({model.num_shows} total) in {elapsed * 1000:.0f} ms")
+    print("Predicted songs for the next show:", predicted_songs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model_cache import source_signature
+from predictions import get_trained_model, parse_tour, predict_next_show, predict_tour
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+HOST = '127.0.0.1'
+PORT = 8765
+
+# How often (seconds) to check whether the XML has new shows
+RELOAD_INTERVAL = 30
+
+
+# Keeps the trained model in memory and swaps in a new one when the show data changes.
+# Retraining happens on a background thread; requests keep getting the old model until
+# the new one is ready.
+class ModelHolder:
+    def __init__(self, xml_file, reload_interval=RELOAD_INTERVAL):
+        self.xml_file = xml_file
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.source = source_signature(xml_file)
+        self.model = get_trained_model(xml_file)
+        self.last_check = time.monotonic()
+        self.reloading = False
+
+    def get(self):
+        with self.lock:
+            now = time.monotonic()
+            if not self.reloading and now - self.last_check >= self.reload_interval:
+                self.last_check = now
+                source = source_signature(self.xml_file)
+                if source != self.source:
+                    self.reloading = True
+                    threading.Thread(target=self._reload, args=(source,), daemon=True).start()
+            return self.model
+
+    # Only retrains if the shows themselves changed (cache is keyed by data hash)
+    def _reload(self, source):
+        try:
+            model = get_trained_model(self.xml_file)
+        except Exception as e:
+            print(f"Warning: reload failed, keeping the current model: {e}")
+            model = None
+
+        with self.lock:
+            if model is not None:
+                self.model = model
+                self.source = source
+            self.reloading = False
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    holder = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        model = self.holder.get()
+        self._send_json(200, {'status': 'ok', 'model': model['data_hash'], 'songs': len(model['songs'])})
+
+    # POST /predict {"location": ..., "days_since_last_show": ..., "max_songs": 20}
+    # POST /predict_tour {"tour": [{"location": ..., "date": "2025-06-20"}, ...], "max_songs": 20}
+    def do_POST(self):
+        if self.path == '/predict_tour':
+            self._predict_tour()
+            return
+        if self.path != '/predict':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            location = request['location']
+            if not isinstance(location, str):
+                raise ValueError("location must be a string")
+            days_since_last_show = float(request.get('days_since_last_show', 0))
+            max_songs = int(request.get('max_songs', 20))
+            if max_songs < 1:
+                raise ValueError("max_songs must be at least 1")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': f"bad request: {e}"})
+            return
+
+        start = time.perf_counter()
+        model = self.holder.get()
+        songs = predict_next_show(model['clf'], location, days_since_last_show, model['songs'],
+                                  model['location_encoder'], max_songs=max_songs, song_features=model['song_features'])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._send_json(200, {'songs': songs, 'model': model['data_hash'], 'elapsed_ms': round(elapsed_ms, 2)})
+
+    def _predict_tour(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            tour = [(stop['location'], stop['date']) for stop in request['tour']]
+            max_songs = int(request.get('max_songs', 20))
+
+            # Dates, tour length and max_songs are checked here so bad input gets a 400
+            model = self.holder.get()
+            parse_tour(model, tour, max_songs)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': f"bad request: {e}"})
+            return
+
+        start = time.perf_counter()
+        forecast = predict_tour(model, tour, max_songs=max_songs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._send_json(200, {'tour': forecast, 'model': model['data_hash'], 'elapsed_ms': round(elapsed_ms, 2)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(xml_file=XML_FILE, host=HOST, port=PORT, reload_interval=RELOAD_INTERVAL):
+    handler = type('Handler', (PredictionHandler,), {'holder': ModelHolder(xml_file, reload_interval)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve setlist predictions over HTTP")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.xml, args.host, args.port, args.reload_interval)
+    print(f"Serving predictions on http://{args.host}:{args.port} (POST /predict, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
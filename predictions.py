@@ -1,66 +1,122 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report
 from collections import Counter
-from bs4 import BeautifulSoup
 import numpy as np
+from scipy.sparse import csr_matrix
+from show_loader import load_columns, split_setlists
+from show_store import drop_duplicate_shows, load_store, store_to_dataframe
+from feature_store import FEATURE_NAMES, RATE_WINDOW, RECENT_WINDOW, chronological_rows, compute_features, update_feature_store
+from model_cache import cached_data_hash, data_hash, load_model, prune_models, remember_data_hash, save_model, source_signature
+from transitions import update_transitions
 
-# Load all data from the xml file
-def load_xml_data(xml_file):
-    with open(xml_file, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file, 'lxml-xml')
+# Load all data from the xml file, through the compiled show store unless use_store is False
+def load_xml_data(xml_file, use_store=True):
+    if use_store:
+        return drop_duplicate_shows(store_to_dataframe(load_store(xml_file))[['date', 'location', 'setlist']])
 
-        shows = []
-
-        # Get show details
-        for show in soup.find_all('show'):
-            date = show.find('date').get_text()
-            location = show.find('location').get_text()
-            setlist = [song.get_text().strip() for song in show.find_all('song')]  # Clean song titles
-            shows.append({
-                'date': date,
-                'location': location,
-                'setlist': setlist
-            })
-
-    return pd.DataFrame(shows)
+    columns = load_columns(xml_file)
+    return drop_duplicate_shows(pd.DataFrame({
+        'date': columns['date'],
+        'location': columns['location'],
+        'setlist': split_setlists(columns['song'], columns['song_offsets'])
+    }))
 
 # Preprocess data for machine learning
 def preprocess_data(df):
     df['date'] = pd.to_datetime(df['date'])
-    df['days_since_last_show'] = df['date'].diff().dt.days.fillna(0)
+
+    # Gaps are taken in date order whatever order the rows are in (the XML is newest first),
+    # so they are the same positive day counts a forecast for a future show passes in
+    dates = df['date'].sort_values(kind='stable')
+    df['days_since_last_show'] = dates.diff().dt.days.fillna(0).reindex(df.index)
     
-    # Encode location using LabelEncoder
+    # Encode location using LabelEncoder (sklearn is only imported by the functions that need it)
+    from sklearn.preprocessing import LabelEncoder
     location_encoder = LabelEncoder()
     df['location_encoded'] = location_encoder.fit_transform(df['location'])
     
     return df, location_encoder
 
-# Train model to predict songs
-def train_model(df, all_songs):
-    rows = []
-    for index, row in df.iterrows():
-        # Add all songs (played and not played) for each show
-        played_songs = set(row['setlist'])
-        for song in all_songs:
-            rows.append({
-                'location_encoded': row['location_encoded'],
-                'days_since_last_show': row['days_since_last_show'],
-                'song': song,
-                'played': 1 if song in played_songs else 0  # 1 if played, 0 if not played
-            })
-    train_df = pd.DataFrame(rows)
-
-    X = train_df[['location_encoded', 'days_since_last_show']]
-    Y = train_df['played']
+FEATURE_COLUMNS = ['location_encoded', 'days_since_last_show', 'song_id']
+
+# Sparse show x song matrix with a 1 wherever the song was played at that show
+def build_play_matrix(setlists, song_index):
+    song_ids = [song_index[song] for setlist in setlists for song in setlist]
+    offsets = np.zeros(len(setlists) + 1, dtype=np.int64)
+    np.cumsum([len(setlist) for setlist in setlists], out=offsets[1:])
+
+    play_matrix = csr_matrix(
+        (np.ones(len(song_ids), dtype=np.int8), np.array(song_ids, dtype=np.int32), offsets),
+        shape=(len(setlists), len(song_index))
+    )
+
+    # A song played twice in one show still only counts as played
+    play_matrix.sum_duplicates()
+    play_matrix.data[:] = 1
+    return play_matrix
+
+# One feature row per (show, song) pair, show-major: location, days since last show, song id,
+# then the feature store's rotation features (FEATURE_NAMES) when song_features is given
+def build_feature_matrix(location_encoded, days_since_last_show, num_songs, song_features=None):
+    num_shows = len(location_encoded)
+    num_extra = 0 if song_features is None else len(FEATURE_NAMES)
+
+    X = np.empty((num_shows * num_songs, len(FEATURE_COLUMNS) + num_extra), dtype=np.float32)
+    X[:, 0] = np.repeat(np.asarray(location_encoded, dtype=np.float32), num_songs)
+    X[:, 1] = np.repeat(np.asarray(days_since_last_show, dtype=np.float32), num_songs)
+    X[:, 2] = np.tile(np.arange(num_songs, dtype=np.float32), num_shows)
+    if num_extra:
+        X[:, 3:] = np.asarray(song_features, dtype=np.float32).reshape(-1, num_extra)
+    return X
+
+# Rotation features from the feature store for every (df show, song) pair, as (shows, songs, features).
+# Shows or songs the feature store doesn't know get zeros.
+def lookup_song_features(features, df, all_songs):
+    rows = np.full(len(df), -1)
+    df_rows, keys = chronological_rows(df)
+    rows[df_rows] = [features.show_index.get(key, -1) for key in keys]
+    cols = np.array([features.song_index.get(song, -1) for song in all_songs])
+
+    values = features.take(np.maximum(rows, 0), np.maximum(cols, 0)).astype(np.float32)
+    values[rows < 0] = 0
+    values[:, cols < 0] = 0
+    return values
+
+# Rotation features for the show after the newest one, lined up with all_songs
+def next_show_song_features(features, all_songs):
+    cols = np.array([features.song_index.get(song, -1) for song in all_songs])
+    values = features.next_show_features()[np.maximum(cols, 0)].astype(np.float32)
+    values[cols < 0] = 0
+    return values
+
+# Build the training matrix straight from integer ids, without a row per (show, song) dict
+def build_training_data(df, all_songs, features=None):
+    song_index = {song: i for i, song in enumerate(all_songs)}
+    play_matrix = build_play_matrix(df['setlist'], song_index)
+
+    song_features = None if features is None else lookup_song_features(features, df, all_songs)
+    X = build_feature_matrix(df['location_encoded'].to_numpy(), df['days_since_last_show'].to_numpy(), len(all_songs), song_features)
+    Y = play_matrix.toarray().ravel()
+    return X, Y
+
+# Random forest settings; model_search.py tunes these
+MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42, 'class_weight': 'balanced'}
+
+def make_classifier(n_jobs=-1, **params):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_jobs=n_jobs, **{**MODEL_PARAMS, **params})
+
+# Train model to predict songs (n_jobs=-1 builds the trees on every core)
+def train_model(df, all_songs, n_jobs=-1, features=None):
+    from sklearn.metrics import classification_report
+    from sklearn.model_selection import train_test_split
+
+    X, Y = build_training_data(df, all_songs, features)
 
     # Split into train and test sets
     X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.2, random_state=42)
 
     # Train random forest classifier with class weight balancing
-    clf = RandomForestClassifier(n_estimators=100, random_state=42, class_weight="balanced")
+    clf = make_classifier(n_jobs=n_jobs)
     clf.fit(X_train, Y_train)
 
     # Evaluate the model
@@ -69,51 +125,231 @@ def train_model(df, all_songs):
 
     return clf
 
-# Predict songs for next show
-def predict_next_show(clf, location, days_since_last_show, song_list, location_encoder, max_songs=20):
-    # Try to encode the location using the trained LabelEncoder, otherwise use a fallback value (-1)
+# P(played) for every song at the next show, scored in one batch
+def song_probabilities(clf, location, days_since_last_show, num_songs, location_encoder, song_features=None):
+    # Try to encode the location using the trained LabelEncoder, otherwise fall back to the
+    # median of the classifier's classes
     try:
         location_encoded = location_encoder.transform([location])[0]
     except ValueError:
-        print(f"Warning: Unseen location '{location}' encountered. Using fallback encoding (-1).")
-        location_encoded = -1
+        print(f"Warning: Unseen location '{location}' encountered. Using fallback encoding (median class).")
+        location_encoded = np.median(clf.classes_)
 
-    # Make DataFrame for songs to be predicted
-    predict_df = pd.DataFrame({
-        'location_encoded': [location_encoded] * len(song_list),
-        'days_since_last_show': [days_since_last_show] * len(song_list)
-    })
-
-    # Handle case where location_encoded is -1 by filling with the median of the training data
-    if location_encoded == -1:
-        predict_df['location_encoded'] = np.median(clf.classes_)
+    # Feature rows for every song at once
+    X = build_feature_matrix([location_encoded], [days_since_last_show], num_songs, song_features)
 
     # Predict if the song will be played
-    probabilities = clf.predict_proba(predict_df)[:, 1]  # Probability for class 1 (played)
+    return clf.predict_proba(X)[:, 1]  # Probability for class 1 (played)
+
+# Predict songs for next show, scoring every song in one batch
+def predict_next_show(clf, location, days_since_last_show, song_list, location_encoder, max_songs=20, song_features=None,
+                      transitions=None):
+    probabilities = song_probabilities(clf, location, days_since_last_show, len(song_list), location_encoder, song_features)
 
     # Sort songs by likelihood of being played, then select the top N (max_songs)
-    song_prob_pairs = list(zip(song_list, probabilities))
-    song_prob_pairs_sorted = sorted(song_prob_pairs, key=lambda x: x[1], reverse=True)
+    top_songs = np.argsort(-probabilities, kind='stable')[:max_songs]
+
+    # Clean the song titles (strip whitespace)
+    predicted_songs = [song_list[i].strip() for i in top_songs]
 
-    # Get top max_songs, and clean the song titles (strip whitespace)
-    predicted_songs = [song.strip() for song, prob in song_prob_pairs_sorted[:max_songs]]
+    # Optionally hand them back in a plausible running order rather than by probability
+    if transitions is not None:
+        predicted_songs = order_setlist(predicted_songs, transitions)
 
     return predicted_songs
 
-def main():
-    xml_file = 'xml_files/allshows_setlistfm.xml'
+# Put predicted songs into a running order using the transition tables (transitions.py): the
+# likeliest opener first, then whichever remaining song most often followed the last two
+# (trigrams, backing off to what followed the last one), and the likeliest closer last.
+# Ties keep the predicted ranking; songs the tables have never seen go at the end.
+def order_setlist(songs, transitions):
+    known = [song for song in songs if song in transitions.song_index]
+    unknown = [song for song in songs if song not in transitions.song_index]
+    if len(known) < 2:
+        return known + unknown
+
+    ids = np.array(transitions.song_ids(known))
+    tie_break = -np.arange(len(known)) * 1e-9
+    remaining = np.ones(len(known), dtype=bool)
+
+    closers = transitions.closers[ids]
+    closer = int(np.argmax(closers + tie_break)) if closers.max() > 0 else None
+    if closer is not None:
+        remaining[closer] = False
+
+    order = [int(np.argmax(np.where(remaining, transitions.openers[ids] + tie_break, -np.inf)))]
+    remaining[order[0]] = False
+
+    while remaining.any():
+        last = known[order[-1]]
+        scores = transitions.next_probabilities(last)[ids]
+        if len(order) > 1:
+            after_pair = transitions.next_after_pair(known[order[-2]], last)[ids]
+            if after_pair.sum():
+                scores = scores + after_pair / after_pair.sum()
+
+        pick = int(np.argmax(np.where(remaining, scores + tie_break, -np.inf)))
+        order.append(pick)
+        remaining[pick] = False
+
+    if closer is not None:
+        order.append(closer)
+    return [known[i] for i in order] + unknown
+
+# Encode every tour location, falling back to the same median value predict_next_show uses
+def encode_locations(location_encoder, locations, clf):
+    known = set(location_encoder.classes_)
+    encoded = np.full(len(locations), np.median(clf.classes_), dtype=np.float32)
+
+    seen = [i for i, location in enumerate(locations) if location in known]
+    if seen:
+        encoded[seen] = location_encoder.transform([locations[i] for i in seen])
+    for i, location in enumerate(locations):
+        if location not in known:
+            print(f"Warning: Unseen location '{location}' encountered. Using fallback encoding (median class).")
+
+    return encoded
+
+# Where the feature store leaves every song after the newest show, lined up with all_songs,
+# so a tour forecast can roll the rotation features forward one date at a time
+def feature_state(features, all_songs):
+    cols = np.array([features.song_index.get(song, -1) for song in all_songs])
+    known = cols >= 0
+    return {
+        'num_shows': features.num_shows,
+        'last_played': np.where(known, features.last_played[np.maximum(cols, 0)], -1),
+        'tail': np.where(known, features.tail()[:, np.maximum(cols, 0)], 0).astype(np.uint8)
+    }
+
+# Check a tour given as (location, date) pairs and return (locations, dates, days since the
+# previous show). Raises ValueError for anything the forecast can't score.
+def parse_tour(model, tour, max_songs=20):
+    if not tour:
+        raise ValueError("the tour has no dates")
+    if max_songs < 1:
+        raise ValueError("max_songs must be at least 1")
+
+    locations = [str(location) for location, _ in tour]
+    dates = pd.to_datetime([date for _, date in tour], format='mixed')
+    if dates.isna().any():
+        raise ValueError("every tour date needs a date")
+
+    last_show = pd.Timestamp(model['last_show_date'])
+    if dates[0] < last_show:
+        raise ValueError(f"tour date {dates[0].date()} is before the model's last show ({last_show.date()})")
+    if (np.diff(dates.values) < np.timedelta64(0, 'D')).any():
+        raise ValueError("tour dates must be in order")
+
+    previous = np.concatenate([[np.datetime64(last_show, 'ns')], dates.values[:-1]])
+    return locations, dates, (dates.values - previous) / np.timedelta64(1, 'D')
+
+# Roll a forecast through a tour one date at a time. Each date is scored with rotation features
+# that count the songs already picked for earlier dates as played, so a song picked on one date
+# has its gap, play rate and played-in-last-3 features reset for the next.
+# pick(i, probabilities) returns the indices (into model['songs']) of the songs chosen for date i.
+def forecast_tour(model, tour, pick, max_songs=20):
+    locations, dates, days_since_last_show = parse_tour(model, tour, max_songs)
+    clf, num_songs = model['clf'], len(model['songs'])
+    location_encoded = encode_locations(model['location_encoder'], locations, clf)
+
+    state = model['feature_state']
+    last_played, tail = state['last_played'].copy(), state['tail']
+    picks = []
+    for i in range(len(tour)):
+        show_index = state['num_shows'] + i
+        gap, rate, recent, _ = compute_features(np.zeros((1, num_songs), dtype=np.uint8), show_index, last_played, tail)
+        song_features = np.stack([gap[0], rate[0], recent[0]], axis=-1)
+        X = build_feature_matrix(location_encoded[i:i + 1], days_since_last_show[i:i + 1], num_songs, song_features)
+        chosen = pick(i, clf.predict_proba(X)[:, 1])
+
+        played = np.zeros((1, num_songs), dtype=np.uint8)
+        played[0, chosen] = 1
+        tail = np.vstack([tail, played])[-max(RATE_WINDOW, RECENT_WINDOW):]
+        last_played[chosen] = show_index
+        picks.append(chosen)
+
+    return locations, dates, picks
+
+# Forecast ranked setlists for a whole tour, given as a list of (location, date) pairs in
+# date order. Each date's top songs are picked with argpartition, conditioned on the songs
+# picked for the dates before it (see forecast_tour).
+def predict_tour(model, tour, max_songs=20, transitions=None):
+    songs = model['songs']
+
+    def pick(i, probabilities):
+        count = min(max_songs, len(probabilities))
+        top = np.argpartition(-probabilities, count - 1)[:count]
+        return top[np.argsort(-probabilities[top], kind='stable')]
+
+    locations, dates, picks = forecast_tour(model, tour, pick, max_songs)
+
+    forecast = []
+    for location, date, top in zip(locations, dates, picks):
+        predicted_songs = [songs[j].strip() for j in top]
+        if transitions is not None:
+            predicted_songs = order_setlist(predicted_songs, transitions)
+
+        forecast.append({
+            'location': location,
+            'date': date.date().isoformat(),
+            'songs': predicted_songs
+        })
+
+    return forecast
+
+# The trees can't extrapolate, so a gap outside the ones the model was trained on scores
+# like the nearest edge of that range; say so rather than quietly predicting from it
+def check_days_since_last_show(model, days_since_last_show):
+    low, high = model['days_since_last_show_range']
+    if not low <= days_since_last_show <= high:
+        print(f"Warning: {days_since_last_show:g} days since the last show is outside the training range "
+              f"({low:g} to {high:g} days).")
+
+# Load the classifier, location encoder and song vocabulary for this data, training
+# them only if the data has changed since the last cached model
+def get_trained_model(xml_file, retrain=False):
+    # An XML file with the same mtime and size as last time goes straight to its model
+    key = None if retrain else cached_data_hash(xml_file)
+    artifacts = None if key is None else load_model(key)
+    if artifacts is not None:
+        return artifacts
+
+    signature = source_signature(xml_file)
     df = load_xml_data(xml_file)
+    key = data_hash(df)
 
-    df, location_encoder = preprocess_data(df)
+    artifacts = None if retrain else load_model(key)
+    if artifacts is None:
+        features = update_feature_store(xml_file)
+        df, location_encoder = preprocess_data(df)
+        all_songs = df['setlist'].explode().dropna().unique()
+        clf = train_model(df, all_songs, features=features)
 
-    all_songs = df['setlist'].explode().unique()
+        artifacts = {
+            'clf': clf,
+            'location_encoder': location_encoder,
+            'songs': all_songs,
+            'song_features': next_show_song_features(features, all_songs),
+            'feature_state': feature_state(features, all_songs),
+            'last_show_date': df['date'].max(),
+            'days_since_last_show_range': (float(df['days_since_last_show'].min()), float(df['days_since_last_show'].max()))
+        }
+        artifacts = save_model(key, artifacts)
+        prune_models()
 
-    clf = train_model(df, all_songs)
+    remember_data_hash(xml_file, signature, key)
+    return artifacts
+
+def main():
+    xml_file = 'xml_files/allshows_setlistfm.xml'
+    model = get_trained_model(xml_file)
 
     # Example data of next show
     location = "Enmarket Arena, Savannah, GA, USA"  # This could be a new location
     days_since_last_show = 120
-    predicted_songs = predict_next_show(clf, location, days_since_last_show, all_songs, location_encoder, max_songs=20)
+    predicted_songs = predict_next_show(model['clf'], location, days_since_last_show, model['songs'], model['location_encoder'],
+                                        max_songs=20, song_features=model['song_features'],
+                                        transitions=update_transitions(xml_file))
 
     print("Predicted songs for the next show:", predicted_songs)
 
@@ -0,0 +1,79 @@
+import os
+import pickle
+from functools import lru_cache
+
+import geopandas as gpd
+import pandas as pd
+
+from geocode import geocode_locations
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+COUNTRIES_SHAPEFILE = os.path.join(PACKAGE_DIR, 'ne_110m_admin_0_countries', 'ne_110m_admin_0_countries.shp')
+SHAPE_CACHE_DIR = os.path.join('cache', 'shapes')
+
+# All the maps and region stats need from the shapefile's ~170 columns
+COUNTRY_COLUMNS = ['NAME', 'ADM0_A3', 'geometry']
+
+# Two-letter state/province code in "Venue, City, ST, USA" style locations
+STATE_PATTERN = r',\s*([A-Z]{2}),\s*(?:USA|Canada)\s*$'
+
+
+# Country outlines, read from the bundled shapefile once and kept as a pickle that is
+# rebuilt whenever the shapefile changes
+@lru_cache(maxsize=None)
+def load_countries(shapefile=COUNTRIES_SHAPEFILE, cache_dir=SHAPE_CACHE_DIR):
+    cache_file = os.path.join(cache_dir, os.path.splitext(os.path.basename(shapefile))[0] + '.pkl')
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(shapefile):
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    countries = gpd.read_file(shapefile)[COUNTRY_COLUMNS]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(countries, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+    return countries
+
+
+# One row per venue: how many shows and songs it had, its coordinates and the state
+# from its name. Venues that couldn't be geocoded are dropped.
+def venue_table(df, geocoder=None, progress=None):
+    venues = df.groupby('location', sort=False).agg(num_shows=('location', 'size'), num_songs=('num_songs', 'sum'))
+
+    coordinates = geocode_locations(venues.index, geocoder, progress=progress)
+    coordinates = pd.DataFrame.from_dict(coordinates, orient='index', columns=['latitude', 'longitude'])
+    venues = venues.join(coordinates).dropna(subset=['latitude', 'longitude']).reset_index()
+
+    venues['state'] = venues['location'].str.extract(STATE_PATTERN, expand=False)
+    return venues
+
+
+# Add the country every venue falls in, with one spatial join over all venues at once.
+# Points that land just outside the coarse 1:110m coastlines get the nearest country.
+def assign_countries(venues, countries=None):
+    if countries is None:
+        countries = load_countries()
+
+    points = gpd.GeoDataFrame(venues, geometry=gpd.points_from_xy(venues['longitude'], venues['latitude']), crs=countries.crs)
+    joined = gpd.sjoin(points, countries, how='left', predicate='within')
+    joined = joined[~joined.index.duplicated()]
+
+    outside = joined['NAME'].isna()
+    if outside.any():
+        # Distances in metres rather than degrees
+        projected = countries.to_crs('EPSG:3857')
+        nearest = gpd.sjoin_nearest(points[outside].to_crs('EPSG:3857'), projected, how='left')
+        nearest = nearest[~nearest.index.duplicated()]
+        joined.loc[outside, ['NAME', 'ADM0_A3']] = nearest[['NAME', 'ADM0_A3']]
+
+    return joined.drop(columns='index_right').rename(columns={'NAME': 'country', 'ADM0_A3': 'country_code'})
+
+
+# Shows, songs and venues per country and state
+def region_stats(venues):
+    return (venues.groupby(['country', 'state'], dropna=False)
+            .agg(num_venues=('location', 'size'), num_shows=('num_shows', 'sum'), num_songs=('num_songs', 'sum'))
+            .sort_values('num_shows', ascending=False)
+            .reset_index())
@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import stats
+from aggregates import compute_aggregates
+from covers import load_cover_catalog
+from geocode import GEOCODERS
+from show_store import load_store
+from transitions import update_transitions
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+COVERS_FILE = 'txt_files/all_covers.txt'
+PLOT_DIR = 'plots'
+MANIFEST_FILE = os.path.join('cache', 'plots', 'manifest.json')
+
+# Every plot in stats.py: output file, plot function, keyword args, and the aggregate
+# fields it draws from (only these go into its input hash)
+PLOTS = [
+    ('plot_num_songs_per_show.png', stats.plot_num_songs_per_show, {}, ('dates', 'num_songs')),
+    ('plot_most_frequent_songs.png', stats.plot_most_frequent_songs, {}, ('song_counts',)),
+    ('plot_song_distribution_across_locations_bar.png', stats.plot_song_distribution_across_locations_bar, {'top_n': 20}, ('locations',)),
+    ('plot_song_repetition_over_time.png', stats.plot_song_repetition_over_time, {}, ('dates', 'song_shows')),
+    ('plot_most_popular_closing_songs.png', stats.plot_most_popular_closing_songs, {}, ('closer_counts',)),
+    ('plot_most_frequent_opening_songs.png', stats.plot_most_frequent_opening_songs, {}, ('opener_counts',)),
+    ('plot_num_songs_trend_over_time.png', stats.plot_num_songs_trend_over_time, {}, ('dates', 'num_songs')),
+    ('plot_shows_heatmap.png', stats.plot_shows_heatmap, {'top_n': 20}, ('location_month_counts',)),
+    ('plot_least_frequent_songs.png', stats.plot_least_frequent_songs, {}, ('song_counts',)),
+    ('plot_popular_cover_songs.png', stats.plot_popular_cover_songs, {'top_n': 20}, ('cover_song_counts',)),
+    ('plot_least_popular_cover_songs.png', stats.plot_least_popular_cover_songs, {}, ('cover_song_counts',))
+]
+
+MAP_PLOT = 'plot_us_map_with_locations.png'
+SEGUE_PLOT = 'plot_most_common_segues.png'
+
+# The cover plots take the cover Counter itself rather than the aggregates
+COUNTER_PLOTS = {stats.plot_popular_cover_songs, stats.plot_least_popular_cover_songs}
+
+
+# Stable bytes for one plot input, whatever type it is
+def _input_bytes(value):
+    if isinstance(value, pd.DataFrame):
+        return repr(value.columns.tolist()).encode('utf-8') + pd.util.hash_pandas_object(value).to_numpy().tobytes()
+    if isinstance(value, pd.Series):
+        return pd.util.hash_pandas_object(value).to_numpy().tobytes()
+    if isinstance(value, np.ndarray):
+        return value.tobytes()
+    if isinstance(value, dict):
+        return repr(list(value.items())).encode('utf-8')
+    return repr(value).encode('utf-8')
+
+
+# Fingerprint of everything that ends up in a plot: its inputs, arguments and drawing code
+def input_hash(plot_func, kwargs, values):
+    hasher = hashlib.sha256()
+    hasher.update(inspect.getsource(plot_func).encode('utf-8'))
+    hasher.update(repr(sorted(kwargs.items())).encode('utf-8'))
+    for value in values:
+        hasher.update(_input_bytes(value))
+        hasher.update(b'\x1d')
+    return hasher.hexdigest()
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# Draw one plot and save it. Runs in a worker process, so the figure never touches the parent.
+def render_plot(plot_func, args, kwargs, path):
+    plt.close('all')
+    plot_func(*args, **kwargs)
+
+    # Some plots draw nothing when they have no data (e.g. no cover songs)
+    if not plt.get_fignums():
+        return None
+
+    tmp_path = path + '.tmp.png'
+    plt.savefig(tmp_path)
+    plt.close('all')
+    os.replace(tmp_path, path)
+    return path
+
+
+def _use_agg():
+    matplotlib.use('Agg')
+
+
+# (filename, plot function, args, kwargs, hash) for every plot, map included if asked for
+def plot_jobs(df, agg, include_map=True, geocoder=None, transitions=None):
+    jobs = []
+    for filename, plot_func, kwargs, fields in PLOTS:
+        values = [getattr(agg, field) for field in fields]
+        args = (agg.cover_song_counts,) if plot_func in COUNTER_PLOTS else (agg,)
+        jobs.append((filename, plot_func, args, kwargs, input_hash(plot_func, kwargs, values)))
+
+    if transitions is not None:
+        kwargs = {'top_n': 20}
+        values = [transitions.songs, transitions.bigrams.data, transitions.bigrams.indices, transitions.bigrams.indptr]
+        jobs.append((SEGUE_PLOT, stats.plot_most_common_segues, (transitions,), kwargs,
+                     input_hash(stats.plot_most_common_segues, kwargs, values)))
+
+    if include_map:
+        map_df = df[['location', 'num_songs']].reset_index(drop=True)
+        kwargs = {'geocoder': geocoder} if geocoder else {}
+        jobs.append((MAP_PLOT, stats.plot_us_map_with_locations, (map_df,), kwargs,
+                     input_hash(stats.plot_us_map_with_locations, kwargs, [map_df])))
+    return jobs
+
+
+# Render every plot whose inputs changed since the last run, in parallel, without a display.
+# Returns {filename: 'rendered' | 'skipped' | 'empty' | 'failed: ...'}.
+def render_all(df, agg, plot_dir=PLOT_DIR, manifest_file=MANIFEST_FILE, max_workers=None, force=False, include_map=True,
+               geocoder=None, transitions=None):
+    os.makedirs(plot_dir, exist_ok=True)
+    manifest = load_manifest(manifest_file)
+    results = {}
+
+    pending = []
+    for filename, plot_func, args, kwargs, digest in plot_jobs(df, agg, include_map, geocoder, transitions):
+        path = os.path.join(plot_dir, filename)
+        if not force and manifest.get(path) == digest and os.path.exists(path):
+            results[filename] = 'skipped'
+        else:
+            pending.append((filename, plot_func, args, kwargs, digest, path))
+
+    if pending:
+        max_workers = min(max_workers or os.cpu_count(), len(pending))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_use_agg) as pool:
+            futures = [(filename, path, digest, pool.submit(render_plot, plot_func, args, kwargs, path))
+                       for filename, plot_func, args, kwargs, digest, path in pending]
+
+            # One broken plot (e.g. the map without network access) shouldn't stop the rest
+            for filename, path, digest, future in futures:
+                try:
+                    rendered = future.result()
+                except Exception as e:
+                    results[filename] = f"failed: {e}"
+                    continue
+                manifest[path] = digest
+                results[filename] = 'rendered' if rendered else 'empty'
+
+    save_manifest(manifest, manifest_file)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every stats plot to PNG without a display")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--covers', default=COVERS_FILE)
+    parser.add_argument('--out', default=PLOT_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Re-render plots even if their inputs haven't changed")
+    parser.add_argument('--no-map', action='store_true', help="Skip the map")
+    parser.add_argument('--geocoder', choices=sorted(GEOCODERS), default=None,
+                        help="Backend for venues not yet in the geocode cache (gazetteer works offline)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    df = stats.create_dataframe(load_store(args.xml))
+    agg = compute_aggregates(df, load_cover_catalog(args.covers))
+    transitions = update_transitions(args.xml)
+
+    results = render_all(df, agg, args.out, max_workers=args.workers, force=args.force,
+                         include_map=not args.no_map, geocoder=args.geocoder, transitions=transitions)
+    for filename, status in results.items():
+        print(f"{os.path.join(args.out, filename)}: {status}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+    if any(status.startswith('failed') for status in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
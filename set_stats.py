@@ -0,0 +1,82 @@
+import numpy as np
+
+from show_store import load_store
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+
+
+# Song IDs that opened / closed each of the given sets: one gather from the offset arrays
+def set_openers(store, sets):
+    return np.asarray(store.song_id)[np.asarray(store.set_offsets)[sets]]
+
+
+def set_closers(store, sets):
+    return np.asarray(store.song_id)[np.asarray(store.set_offsets)[np.asarray(sets) + 1] - 1]
+
+
+# Song IDs of every performance in the given sets
+def set_songs(store, sets):
+    offsets = np.asarray(store.set_offsets)
+    in_sets = np.zeros(len(offsets) - 1, dtype=bool)
+    in_sets[sets] = True
+    return np.asarray(store.song_id)[np.repeat(in_sets, np.diff(offsets))]
+
+
+# Shows whose setlist has set headings; shows without them are one unnamed set
+def structured_shows(store):
+    named = np.asarray(store.set_names)[np.asarray(store.set_code)] != ''
+    return np.unique(store.set_shows()[named])
+
+
+# Fraction of structured shows that had an encore
+def encore_frequency(store):
+    structured = structured_shows(store)
+    if not len(structured):
+        return 0.0
+    return len(np.unique(store.set_shows()[store.encore_sets()])) / len(structured)
+
+
+# (song, next song) ID pairs for every marked segue
+def segue_pairs(store):
+    segue = np.flatnonzero(np.asarray(store.segue))
+
+    # A marker on a show's last song has nothing to segue into
+    offsets = np.asarray(store.song_offsets)
+    segue = segue[~np.isin(segue + 1, offsets)]
+    song_id = np.asarray(store.song_id)
+    return song_id[segue], song_id[segue + 1]
+
+
+# Most common song IDs as (name, count)
+def top_songs(store, song_ids, top_n=10):
+    counts = np.bincount(song_ids, minlength=len(store.song_names))
+    top = np.argsort(-counts, kind='stable')[:top_n]
+    return [(str(store.song_names[i]), int(counts[i])) for i in top if counts[i]]
+
+
+def top_segues(store, top_n=10):
+    first, then = segue_pairs(store)
+    pairs, counts = np.unique(np.stack([first, then], axis=1), axis=0, return_counts=True)
+    top = np.argsort(-counts, kind='stable')[:top_n]
+    return [(f"{store.song_names[pairs[i, 0]]} > {store.song_names[pairs[i, 1]]}", int(counts[i])) for i in top]
+
+
+# (title, rows) tables for the set structure, like the ones `wsp stats` prints
+def set_tables(store, top_n=10):
+    tables = [
+        ('Most common first set openers', top_songs(store, set_openers(store, store.sets_named('Set 1')), top_n)),
+        ('Most common second set openers', top_songs(store, set_openers(store, store.sets_named('Set 2')), top_n)),
+        ('Most common encore songs', top_songs(store, set_songs(store, store.encore_sets()), top_n)),
+        ('Most common marked segues', top_segues(store, top_n))
+    ]
+    return [(title, rows) for title, rows in tables if rows]
+
+
+if __name__ == "__main__":
+    store = load_store(XML_FILE)
+    print(f"{len(structured_shows(store))} of {store.num_shows} shows have set headings, "
+          f"{encore_frequency(store):.0%} of those with an encore")
+    for title, rows in set_tables(store):
+        print(f"\n{title}:")
+        for name, count in rows:
+            print(f"  {count:5d}  {name}")
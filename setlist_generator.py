@@ -0,0 +1,168 @@
+import numpy as np
+
+from predictions import check_days_since_last_show, forecast_tour, song_probabilities
+from show_store import load_store
+from transitions import update_transitions
+
+BEAM_WIDTH = 16
+
+# Additive smoothing for transition/opener/closer probabilities, so a pair the band has
+# never played back to back is unlikely rather than impossible
+SMOOTHING = 5.0
+
+# How much each part of the score counts
+PLAYED_WEIGHT = 1.0
+TRANSITION_WEIGHT = 1.0
+
+# Setlist lengths outside this range of the historical distribution are never generated
+LENGTH_QUANTILES = (0.05, 0.95)
+
+# Played probabilities are clipped into this range before taking log-odds
+MIN_PROBABILITY = 1e-4
+
+
+# Setlist lengths in the central LENGTH_QUANTILES range of past shows, with how often each occurred
+def length_distribution(num_songs, quantiles=LENGTH_QUANTILES):
+    num_songs = np.asarray(num_songs)
+    num_songs = num_songs[num_songs > 0]
+    min_length, max_length = (int(q) for q in np.quantile(num_songs, quantiles, method='nearest'))
+
+    lengths = np.arange(min_length, max_length + 1)
+    counts = np.bincount(num_songs, minlength=max_length + 1)[min_length:max_length + 1]
+    return lengths, counts / counts.sum()
+
+
+# Log "lift" of a smoothed conditional distribution over the unigram distribution:
+# log P(song | context) - log P(song). Zero means the context tells us nothing.
+def _log_lift(counts, unigram, smoothing):
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.log((counts + smoothing * unigram) / (totals + smoothing)) - np.log(unigram)
+
+
+# Beam search for ordered setlists. A setlist's score is the sum over its songs of
+#   PLAYED_WEIGHT * logit(P(played))              -- from the play model
+#   TRANSITION_WEIGHT * lift(song | previous song) -- from the transition tables
+# plus opener and closer lifts. Setlist lengths come from the historical distribution
+# (the most common one, or sampled), and the search finds the best setlists of that length.
+class SetlistGenerator:
+    def __init__(self, transitions, num_songs, beam_width=BEAM_WIDTH, smoothing=SMOOTHING,
+                 played_weight=PLAYED_WEIGHT, transition_weight=TRANSITION_WEIGHT):
+        self.songs = transitions.songs
+        self.song_index = transitions.song_index
+        self.beam_width = beam_width
+        self.played_weight = played_weight
+        self.lengths, self.length_probabilities = length_distribution(num_songs)
+        self.typical_length = int(self.lengths[np.argmax(self.length_probabilities)])
+
+        # Dense (songs x songs) lift table: a few MB, and every beam step is one row gather
+        counts = transitions.bigrams.toarray().astype(float)
+        unigram = (counts.sum(axis=0) + transitions.openers + 1.0)
+        unigram /= unigram.sum()
+        self.transition_lift = transition_weight * _log_lift(counts, unigram, smoothing)
+        self.opener_lift = transition_weight * _log_lift(transitions.openers.astype(float), unigram, smoothing)
+        self.closer_lift = transition_weight * _log_lift(transitions.closers.astype(float), unigram, smoothing)
+
+    # Setlist lengths drawn from how often each occurred historically
+    def sample_lengths(self, num_setlists, rng):
+        return rng.choice(self.lengths, size=num_setlists, p=self.length_probabilities)
+
+    # Played probabilities for `songs` (any order/vocabulary) as a vector over this generator's songs
+    def align(self, songs, probabilities):
+        aligned = np.full(len(self.songs), MIN_PROBABILITY)
+        for song, probability in zip(songs, probabilities):
+            i = self.song_index.get(song.strip())
+            if i is not None:
+                aligned[i] = probability
+        return aligned
+
+    # Best `num_setlists` setlists as (songs, score), best first, with score per song used
+    # for ranking across lengths. lengths gives one target length per setlist; by default
+    # they are all the typical length, or sampled from the history when noise > 0. With
+    # noise > 0 the beam keeps Gumbel-perturbed choices, sampling varied candidates.
+    def generate(self, played, num_setlists=1, lengths=None, noise=0.0, rng=None):
+        num_songs = len(self.songs)
+        rng = rng if rng is not None else np.random.default_rng()
+        if lengths is None:
+            lengths = self.sample_lengths(num_setlists, rng) if noise else [self.typical_length] * num_setlists
+        wanted = np.bincount(np.minimum(lengths, num_songs))
+        width = max(self.beam_width, int(wanted.max()))
+
+        played = np.clip(played, MIN_PROBABILITY, 1 - MIN_PROBABILITY)
+        song_scores = self.played_weight * (np.log(played) - np.log1p(-played))
+
+        def select(candidates):
+            ranked = candidates + rng.gumbel(scale=noise, size=candidates.shape) if noise else candidates
+            keep = min(width, int(np.isfinite(candidates).sum()))
+            top = np.argpartition(-ranked, keep - 1, axis=None)[:keep]
+            return top[np.argsort(-ranked.ravel()[top], kind='stable')]
+
+        # First song of each beam
+        candidates = song_scores + self.opener_lift
+        top = select(candidates)
+        sequences = top[:, None]
+        scores = candidates[top]
+        used = np.zeros((len(top), num_songs), dtype=bool)
+        used[np.arange(len(top)), top] = True
+
+        finished = []
+        for length in range(1, len(wanted)):
+            # Beams are kept best first, so the setlists of this length are the leading ones
+            if wanted[length]:
+                final = scores + self.closer_lift[sequences[:, -1]]
+                for j in np.argsort(-final, kind='stable')[:wanted[length]]:
+                    finished.append(([self.songs[i] for i in sequences[j]], float(final[j]) / length))
+            if length == len(wanted) - 1:
+                break
+
+            # Extend every beam by every unused song, then keep the best `width` overall
+            candidates = scores[:, None] + self.transition_lift[sequences[:, -1]] + song_scores[None, :]
+            candidates[used] = -np.inf
+            top = select(candidates)
+            parents, next_songs = np.divmod(top, num_songs)
+
+            sequences = np.hstack([sequences[parents], next_songs[:, None]])
+            scores = candidates.ravel()[top]
+            used = used[parents]
+            used[np.arange(len(top)), next_songs] = True
+
+        return sorted(finished, key=lambda setlist: setlist[1], reverse=True)
+
+
+def load_generator(xml_file, **kwargs):
+    return SetlistGenerator(update_transitions(xml_file), load_store(xml_file).num_songs, **kwargs)
+
+
+# Ordered setlist for the next show from a trained model (see predictions.get_trained_model)
+def generate_next_show(model, generator, location, days_since_last_show, num_setlists=1):
+    check_days_since_last_show(model, days_since_last_show)
+    probabilities = song_probabilities(model['clf'], location, days_since_last_show, len(model['songs']),
+                                       model['location_encoder'], model['song_features'])
+    return generator.generate(generator.align(model['songs'], probabilities), num_setlists)
+
+
+# Ordered setlists for every date of a tour. Each date's best setlist is what the next
+# dates are conditioned on (see predictions.forecast_tour), so the tour rotates.
+def generate_tour(model, tour, generator, num_candidates=1, noise=0.0, rng=None):
+    model_index = {song.strip(): i for i, song in enumerate(model['songs'])}
+    candidates = []
+
+    def pick(i, probabilities):
+        setlists = generator.generate(generator.align(model['songs'], probabilities), num_candidates,
+                                      noise=noise, rng=rng)
+        candidates.append(setlists)
+        return np.array([model_index[song] for song in setlists[0][0] if song in model_index], dtype=np.int64)
+
+    locations, dates, _ = forecast_tour(model, tour, pick)
+
+    forecast = []
+    for location, date, setlists in zip(locations, dates, candidates):
+        best_songs, best_score = setlists[0]
+        forecast.append({
+            'location': location,
+            'date': date.date().isoformat(),
+            'songs': best_songs,
+            'score': round(best_score, 3),
+            'alternatives': [songs for songs, _ in setlists[1:]]
+        })
+
+    return forecast
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from show_store import load_store
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+
+
+# Postings for one key: rows of `values` grouped by `keys`, as (offsets, sorted values)
+def _group_postings(keys, values, num_keys):
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(num_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_keys), out=offsets[1:])
+    return offsets, values[order]
+
+
+# Inverted index over a ShowStore. Shows are numbered oldest first ("positions"), and
+# every song and venue maps to the sorted array of positions it appears at, so queries
+# are binary searches and sorted-array intersections instead of scans over every setlist.
+class SetlistIndex:
+    def __init__(self, store):
+        self.store = store
+        self.song_table = store.song_table
+        self.location_table = store.location_table
+
+        # Chronological show order; position p is store row show_rows[p]
+        dates = np.asarray(store.date)
+        self.show_rows = np.argsort(dates, kind='stable')
+        self.dates = dates[self.show_rows]
+        self.location_code = np.asarray(store.location_code)[self.show_rows]
+        position_of_row = np.empty_like(self.show_rows)
+        position_of_row[self.show_rows] = np.arange(len(self.show_rows))
+
+        # Every performance as (song, show position, slot in that setlist)
+        offsets = np.asarray(store.song_offsets)
+        song_id = np.asarray(store.song_id)
+        num_songs = np.diff(offsets)
+        occurrence_show = position_of_row[np.repeat(np.arange(len(num_songs)), num_songs)]
+        occurrence_slot = np.arange(len(song_id)) - np.repeat(offsets[:-1], num_songs)
+        self.slot_width = int(num_songs.max(initial=0)) + 1
+
+        # Sort performances by (song, show, slot) so each song's run is in show order
+        order = np.lexsort((occurrence_slot, occurrence_show, song_id))
+        self.occurrence_song = song_id[order]
+        self.occurrence_show = occurrence_show[order]
+        self.occurrence_slot = occurrence_slot[order]
+        self.occurrence_offsets = np.zeros(len(store.song_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.occurrence_song, minlength=len(store.song_names)), out=self.occurrence_offsets[1:])
+
+        # Song -> distinct show positions (a song played twice in one show counts once)
+        first_in_show = np.ones(len(order), dtype=bool)
+        first_in_show[1:] = (self.occurrence_song[1:] != self.occurrence_song[:-1]) | \
+                            (self.occurrence_show[1:] != self.occurrence_show[:-1])
+        self.song_offsets, self.song_postings = _group_postings(
+            self.occurrence_song[first_in_show], self.occurrence_show[first_in_show], len(store.song_names))
+
+        # Venue -> show positions
+        self.location_offsets, self.location_postings = _group_postings(
+            self.location_code, np.arange(len(self.location_code)), len(store.location_names))
+
+    @property
+    def num_shows(self):
+        return len(self.dates)
+
+    def song_id(self, song):
+        if isinstance(song, (int, np.integer)):
+            return int(song)
+        song_id = self.song_table.id_of(song)
+        if song_id < 0:
+            raise KeyError(f"unknown song: {song!r}")
+        return song_id
+
+    def location_id(self, location):
+        if isinstance(location, (int, np.integer)):
+            return int(location)
+        location_id = self.location_table.id_of(location)
+        if location_id < 0:
+            raise KeyError(f"unknown location: {location!r}")
+        return location_id
+
+    # Sorted positions of the shows a song was played at
+    def shows_with(self, song):
+        song_id = self.song_id(song)
+        return self.song_postings[self.song_offsets[song_id]:self.song_offsets[song_id + 1]]
+
+    def shows_at(self, location):
+        location_id = self.location_id(location)
+        return self.location_postings[self.location_offsets[location_id]:self.location_offsets[location_id + 1]]
+
+    # Shows with every one of the songs, intersecting the shortest postings first.
+    # No songs is no constraint, so every show matches.
+    def shows_with_all(self, *songs):
+        if not songs:
+            return np.arange(self.num_shows)
+        postings = sorted((self.shows_with(song) for song in songs), key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def shows_with_any(self, *songs):
+        if not songs:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([self.shows_with(song) for song in songs]))
+
+    # (show positions, setlist slots) of every performance of a song
+    def _occurrences(self, song):
+        song_id = self.song_id(song)
+        start, end = self.occurrence_offsets[song_id], self.occurrence_offsets[song_id + 1]
+        return self.occurrence_show[start:end], self.occurrence_slot[start:end]
+
+    # Shows where `first` was played somewhere before `then`; with adjacent=True, directly before it
+    def shows_where_before(self, first, then, adjacent=False):
+        first_shows, first_slots = self._occurrences(first)
+        then_shows, then_slots = self._occurrences(then)
+
+        if adjacent:
+            # Encode (show, slot) as one integer so segues become a sorted-array intersection
+            width = self.slot_width
+            follows = np.intersect1d(first_shows * width + first_slots + 1, then_shows * width + then_slots, assume_unique=True)
+            return np.unique(follows // width)
+
+        # Earliest slot of `first` and latest slot of `then` in each show; runs are sorted by (show, slot)
+        first_start = np.ones(len(first_shows), dtype=bool)
+        first_start[1:] = first_shows[1:] != first_shows[:-1]
+        then_end = np.ones(len(then_shows), dtype=bool)
+        then_end[:-1] = then_shows[1:] != then_shows[:-1]
+
+        shows, first_at, then_at = np.intersect1d(first_shows[first_start], then_shows[then_end],
+                                                  assume_unique=True, return_indices=True)
+        return shows[first_slots[first_start][first_at] < then_slots[then_end][then_at]]
+
+    # Positions of the shows dated start..end inclusive (either end may be None)
+    def shows_between(self, start=None, end=None, location=None):
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start), 'D'), side='left')
+        hi = self.num_shows if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end), 'D'), side='right')
+        if location is None:
+            return np.arange(lo, hi)
+
+        # Postings are sorted, so the date window is another pair of binary searches
+        shows = self.shows_at(location)
+        return shows[np.searchsorted(shows, lo):np.searchsorted(shows, hi)]
+
+    def first_played(self, song):
+        shows = self.shows_with(song)
+        return self.show_info(shows[:1])[0] if len(shows) else None
+
+    def last_played(self, song):
+        shows = self.shows_with(song)
+        return self.show_info(shows[-1:])[0] if len(shows) else None
+
+    def play_count(self, song):
+        return len(self.shows_with(song))
+
+    # {'position', 'date', 'location'} for each show position
+    def show_info(self, shows):
+        shows = np.asarray(shows, dtype=np.int64)
+        locations = self.store.location_names[self.location_code[shows]]
+        return [{'position': int(show), 'date': pd.Timestamp(date), 'location': str(location)}
+                for show, date, location in zip(shows, self.dates[shows], locations)]
+
+    # One row per show position, for printing or further pandas work
+    def to_frame(self, shows):
+        return pd.DataFrame(self.show_info(shows), columns=['position', 'date', 'location'])
+
+    # 1 for every show position where the song was played, else 0
+    def played_mask(self, song):
+        mask = np.zeros(self.num_shows, dtype=np.int8)
+        mask[self.shows_with(song)] = 1
+        return mask
+
+
+def load_index(xml_file=XML_FILE):
+    return SetlistIndex(load_store(xml_file))
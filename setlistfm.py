@@ -1,37 +1,86 @@
-import requests
+import argparse
+import os
 from bs4 import BeautifulSoup
-from tqdm import tqdm
-import matplotlib.pyplot as plt
-import pandas as pd
-from collections import Counter
+from crawler import Crawler, MAX_CONCURRENCY, REQUESTS_PER_SECOND
+from crawl_journal import CrawlJournal
+from http_cache import HTTPCache
+from symbols import normalize_set_name, split_segue
+from xml_writer import ShowXMLWriter
 
 # Base URL template to plug in years
 # base_list_url = "https://widespreadpanic.com/shows/past/?sf_paged={page_num}"
 base_list_url = "https://www.setlist.fm/setlists/widespread-panic-13d6ad15.html?page={page_num}"
 base_domain = "https://www.setlist.fm"
+list_page_range = range(78, 304)
+
+# The listing is newest first, so an incremental crawl walks up from page 1
+new_page_range = range(1, list_page_range.stop)
+output_xml = 'allshows_setlistfm_2008.xml'
+
+# Pull the show links out of one listing page
+def parse_show_links(content, domain=base_domain):
+    soup = BeautifulSoup(content, 'html.parser')
+
+    show_links = []
+    for link in soup.find_all('a', class_='summary url'):
+        url = link['href']
+        full_url = domain + url.lstrip("..")
+        show_links.append(full_url)
+
+    return show_links
 
 # get all of the show links
-def get_all_show_links():
-    print("Getting all show links...")
-    all_show_links = []
-    for page_num in range(78, 304):
-        list_url = base_list_url.format(page_num=page_num)
-        response = requests.get(list_url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        for link in soup.find_all('a', class_='summary url'):
-            url = link['href']
-            full_url = base_domain + url.lstrip("..")
-            all_show_links.append(full_url)
-            print(f"Found show link: {full_url}")
+def get_all_show_links(crawler=None, pages=list_page_range, list_url=base_list_url, domain=base_domain):
+    if crawler is None:
+        with Crawler() as crawler:
+            return get_all_show_links(crawler, pages, list_url, domain)
 
-    return all_show_links
+    print("Getting all show links...")
+    list_urls = [list_url.format(page_num=page_num) for page_num in pages]
 
+    page_links = crawler.map(lambda url, content: parse_show_links(content, domain), list_urls, desc="Fetching listing pages")
+    all_show_links = [url for links in page_links if links is not None for url in links]
+    print(f"Found {len(all_show_links)} show links")
 
+    return all_show_links
 
-def get_show_data(show_url):
-    response = requests.get(show_url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+# Walk the listing pages newest first (page 1 up) and stop at the first page that holds
+# nothing we haven't seen, or that holds no shows at all (past the end of the listing)
+def get_new_show_links(crawler, journal, pages=new_page_range, list_url=base_list_url, domain=base_domain):
+    print("Getting new show links...")
+    pages = list(pages)
+    new_show_links = []
+
+    for start in range(0, len(pages), crawler.max_concurrency):
+        batch = pages[start:start + crawler.max_concurrency]
+        list_urls = [list_url.format(page_num=page_num) for page_num in batch]
+        page_links = crawler.map(lambda url, content: parse_show_links(content, domain), list_urls)
+
+        # A batch where every page failed means the listing ended or the site is down
+        done = all(links is None for links in page_links)
+        for links in page_links:
+            if links is None:
+                continue
+            unseen = [url for url in links if not journal.is_known(url)]
+            new_show_links.extend(unseen)
+            if not unseen:
+                done = True
+
+        if done:
+            break
+
+    print(f"Found {len(new_show_links)} new show links")
+    return new_show_links
+
+def get_show_data(show_url, crawler=None):
+    if crawler is None:
+        with Crawler() as crawler:
+            return get_show_data(show_url, crawler)
+    return parse_show_data(crawler.fetch(show_url))
+
+# Parse the location, date and setlist out of one show page
+def parse_show_data(content):
+    soup = BeautifulSoup(content, 'html.parser')
 
     # Get show location
     h1_tag = soup.find('h1')
@@ -59,63 +108,97 @@ def get_show_data(show_url):
     else:
         date = "Unknown date"
 
-    # Find all songs in setlist
-    song_tags = soup.find_all('a', class_='songLabel')
-    setlist = []
-
-    for songs in song_tags:
-        song_title = songs.get_text()
-        setlist.append(song_title)
+    setlist, sets, segues = parse_setlist(soup)
 
     return {
         'date': date,
         'location': location,
-        'setlist': setlist
+        'setlist': setlist,
+        'sets': sets,
+        'segues': segues
     }
 
-def save_to_xml(show_data):
-    # Create a new BeautifulSoup object for building XML using lxml-xml parser
-    soup = BeautifulSoup('<?xml version="1.0" encoding="UTF-8"?>', 'lxml-xml')
-    # Create the root element
-    wsp_data = soup.new_tag('wsp_data')
-    soup.append(wsp_data)
-
-    for show in show_data:
-        show_tag = soup.new_tag('show')
-
-        location = soup.new_tag('location')
-        location.string = show['location']
-
-        date = soup.new_tag('date')
-        date.string = show['date']
-
-        setlist = soup.new_tag('setlist')
-        if show['setlist']:
-            for song_title in show['setlist']:
-                song = soup.new_tag('song')
-                song.string = song_title
-                setlist.append(song)
-
-        show_tag.append(location)
-        show_tag.append(date)
-        show_tag.append(setlist)
-        wsp_data.append(show_tag)
-    
-    with open('allshows_setlistfm_2008.xml', 'w', encoding='utf-8') as f:
-        f.write(soup.prettify())
+# Walk the setlist in page order. Set headings ("Set 1:", "Encore:") start a new set;
+# songs before any heading go in one unnamed set. Returns the flat song list, the sets
+# as (name, number of songs) and whether each song segued into the next.
+def parse_setlist(soup):
+    song_list = soup.find('ol', class_='songsList')
+    items = song_list.find_all('li', recursive=False) if song_list else soup.find_all('a', class_='songLabel')
 
-def main():
-    all_show_links = get_all_show_links()
-    all_show_data = []
-
-    if not all_show_links:
-        print("No show links found on the page.")
-    
-    for show in tqdm(all_show_links, desc="Processing shows"):
-        show_data = get_show_data(show)
-        all_show_data.append(show_data)
-
-    save_to_xml(all_show_data)
+    setlist = []
+    sets = []
+    segues = []
+    for item in items:
+        label = item if item.name == 'a' else item.find('a', class_='songLabel')
+        if label is None:
+            classes = item.get('class') or []
+            if any('setHeadline' in c for c in classes) or item.find(class_='setHeadline'):
+                sets.append((normalize_set_name(item.get_text()), 0))
+            continue
+
+        song_title, segue = split_segue(label.get_text())
+        if not sets:
+            sets.append(('', 0))
+        sets[-1] = (sets[-1][0], sets[-1][1] + 1)
+        setlist.append(song_title)
+        segues.append(segue)
+
+    # Headings with nothing under them (e.g. an empty encore placeholder) aren't sets
+    return setlist, [(name, num_songs) for name, num_songs in sets if num_songs], segues
+
+def save_to_xml(show_data, path=output_xml):
+    with ShowXMLWriter(path) as writer:
+        writer.write_shows(show_data)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Widespread Panic setlists from setlist.fm")
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY, help="Number of pages fetched at once")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help="Max requests per second per host (0 = unlimited)")
+    parser.add_argument('--base-url', default=None, help="Crawl a local fixture server (e.g. http://127.0.0.1:8000) instead of setlist.fm")
+    parser.add_argument('--full', action='store_true', help="Re-walk every listing page instead of stopping at already seen shows")
+    parser.add_argument('--no-cache', action='store_true', help="Don't read or write the on-disk page cache")
+    args = parser.parse_args(argv)
+
+    list_url, domain = base_list_url, base_domain
+    if args.base_url:
+        domain = args.base_url.rstrip('/')
+        list_url = base_list_url.replace(base_domain, domain)
+
+    cache = None if args.no_cache else HTTPCache()
+    journal = CrawlJournal()
+
+    with Crawler(max_concurrency=args.max_concurrency, requests_per_second=args.rate, cache=cache) as crawler:
+        if args.full or not journal.links:
+            found_links = get_all_show_links(crawler, list_url=list_url, domain=domain)
+        else:
+            found_links = get_new_show_links(crawler, journal, list_url=list_url, domain=domain)
+        journal.add_links(found_links)
+
+        # Resume anything a previous run discovered but didn't finish
+        show_links = journal.pending_links()
+        if not show_links:
+            print("No new shows to process.")
+
+        def parse_and_checkpoint(url, content):
+            show_data = parse_show_data(content)
+            journal.add_show(url, show_data)
+            return show_data
+
+        # Pages that failed come back as None and stay pending in the journal for the next run
+        new_shows = [show for show in crawler.imap(parse_and_checkpoint, show_links, desc="Processing shows")
+                     if show is not None]
+
+    # Rebuild the XML newest first from everything journaled, so new shows land at the head
+    # and a run that started without a journal (a full crawl) can't duplicate what the old
+    # file held. Written beside the file and swapped in, so readers never see half of it.
+    if not len(journal):
+        print("No shows journaled; leaving the XML file as it is.")
+        return
+    if new_shows or args.full or not os.path.exists(output_xml):
+        tmp_path = output_xml + '.tmp'
+        with ShowXMLWriter(tmp_path) as writer:
+            writer.write_shows(journal.all_shows())
+        os.replace(tmp_path, output_xml)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+from symbols import normalize_set_name, split_segue
+
+
+# Stream shows out of the XML one <show> element at a time, freeing each as we go.
+# recover=True keeps going past junk like the code pasted after allshows.xml's root.
+# Songs may sit straight under <setlist> or inside <set name="..."> elements; either way
+# they come back as one flat setlist, with the sets as (name, number of songs) and
+# whether each song segued into the next (segue="true" or a legacy trailing ">").
+def iter_shows(xml_file):
+    for _, show in etree.iterparse(xml_file, events=('end',), tag='show', recover=True):
+        setlist = []
+        sets = []
+        segues = []
+        current_set = None
+        for song in show.iter('song'):
+            parent = song.getparent()
+            set_element = parent if parent.tag == 'set' else None
+            if not sets or set_element is not current_set:
+                name = normalize_set_name(set_element.get('name', '')) if set_element is not None else ''
+                sets.append([name, 0])
+                current_set = set_element
+
+            song_title, segue = split_segue(song.text or '')
+            setlist.append(song_title)
+            segues.append(segue or song.get('segue') == 'true')
+            sets[-1][1] += 1
+
+        yield {
+            'date': (show.findtext('date') or '').strip(),
+            'location': (show.findtext('location') or '').strip(),
+            'setlist': setlist,
+            'sets': [tuple(s) for s in sets],
+            'segues': segues
+        }
+
+        # Drop the parsed element and anything before it so memory stays flat
+        show.clear()
+        while show.getprevious() is not None:
+            del show.getparent()[0]
+
+
+# Load every show into flat columns: one entry per show plus a flat song list,
+# where show i's songs are songs[song_offsets[i]:song_offsets[i + 1]]. Sets are one
+# more level of offsets: show i's sets are set_name[show_set_offsets[i]:show_set_offsets[i + 1]],
+# and set j's songs are songs[set_offsets[j]:set_offsets[j + 1]].
+def load_columns(xml_file):
+    dates = []
+    locations = []
+    songs = []
+    num_songs = []
+    segues = []
+    set_names = []
+    set_sizes = []
+    num_sets = []
+
+    for show in iter_shows(xml_file):
+        dates.append(show['date'])
+        locations.append(show['location'])
+        songs.extend(show['setlist'])
+        num_songs.append(len(show['setlist']))
+        segues.extend(show['segues'])
+        set_names.extend(name for name, _ in show['sets'])
+        set_sizes.extend(size for _, size in show['sets'])
+        num_sets.append(len(show['sets']))
+
+    num_songs = np.array(num_songs, dtype=np.int32)
+    song_offsets = np.zeros(len(num_songs) + 1, dtype=np.int64)
+    np.cumsum(num_songs, out=song_offsets[1:])
+    set_offsets = np.zeros(len(set_sizes) + 1, dtype=np.int64)
+    np.cumsum(set_sizes, out=set_offsets[1:])
+    show_set_offsets = np.zeros(len(num_sets) + 1, dtype=np.int64)
+    np.cumsum(num_sets, out=show_set_offsets[1:])
+
+    return {
+        'date': dates,
+        'location': locations,
+        'num_songs': num_songs,
+        'song': songs,
+        'song_offsets': song_offsets,
+        'segue': np.array(segues, dtype=bool),
+        'set_name': set_names,
+        'set_offsets': set_offsets,
+        'show_set_offsets': show_set_offsets
+    }
+
+
+# Rebuild per-show setlists from the flat song column
+def split_setlists(songs, song_offsets):
+    return [songs[start:end] for start, end in zip(song_offsets[:-1], song_offsets[1:])]
+
+
+# Columns -> one row per show, the layout stats.py and predictions.py work with
+def columns_to_dataframe(columns):
+    return pd.DataFrame({
+        'date': columns['date'],
+        'location': columns['location'],
+        'num_songs': columns['num_songs'],
+        'setlist': split_setlists(columns['song'], columns['song_offsets'])
+    })
+
+
+def load_dataframe(xml_file):
+    return columns_to_dataframe(load_columns(xml_file))
@@ -0,0 +1,208 @@
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from show_loader import load_columns
+from symbols import SymbolTable, UNKNOWN_LOCATION, is_encore, normalize_set_name
+
+STORE_DIR = 'store'
+STORE_VERSION = 3
+XML_GLOB = os.path.join('xml_files', '*.xml')
+
+
+ARRAYS = ('date', 'location_code', 'location_names', 'song_id', 'song_offsets', 'song_names',
+          'segue', 'set_code', 'set_names', 'set_offsets', 'show_set_offsets')
+
+
+# Compiled, columnar copy of one XML file. Shows are rows of the show table; songs
+# live in one flat performance table where show i owns song_id[song_offsets[i]:song_offsets[i + 1]].
+# Sets are a table in between: show i owns sets show_set_offsets[i]:show_set_offsets[i + 1],
+# set j owns performances set_offsets[j]:set_offsets[j + 1], and set_code[j] names it.
+# segue[k] is set when performance k ran straight into the next one.
+class ShowStore:
+    def __init__(self, arrays, meta):
+        self.date = arrays['date']
+        self.location_code = arrays['location_code']
+        self.location_names = arrays['location_names']
+        self.song_id = arrays['song_id']
+        self.song_offsets = arrays['song_offsets']
+        self.song_names = arrays['song_names']
+        self.segue = arrays['segue']
+        self.set_code = arrays['set_code']
+        self.set_names = arrays['set_names']
+        self.set_offsets = arrays['set_offsets']
+        self.show_set_offsets = arrays['show_set_offsets']
+        self.meta = meta
+        self._song_table = None
+        self._location_table = None
+        self._set_table = None
+
+    # Symbol tables for looking up IDs by (normalized) name
+    @property
+    def song_table(self):
+        if self._song_table is None:
+            self._song_table = SymbolTable(self.song_names.tolist())
+        return self._song_table
+
+    @property
+    def location_table(self):
+        if self._location_table is None:
+            self._location_table = SymbolTable(self.location_names.tolist(), unknown_name=UNKNOWN_LOCATION)
+        return self._location_table
+
+    @property
+    def set_table(self):
+        if self._set_table is None:
+            self._set_table = SymbolTable(self.set_names.tolist(), unknown_name='')
+        return self._set_table
+
+    @property
+    def num_shows(self):
+        return len(self.date)
+
+    @property
+    def num_songs(self):
+        return np.diff(self.song_offsets)
+
+    @property
+    def num_sets(self):
+        return np.diff(self.show_set_offsets)
+
+    # Slot of every performance within its show (0 = opener)
+    def positions(self):
+        offsets = np.asarray(self.song_offsets)
+        return np.arange(offsets[-1]) - np.repeat(offsets[:-1], np.diff(offsets))
+
+    # Show row of every set
+    def set_shows(self):
+        return np.repeat(np.arange(self.num_shows), self.num_sets)
+
+    # Indices of the sets with this name ("Set 2", "Set II:", "Encore", ...)
+    def sets_named(self, name):
+        return np.flatnonzero(self.set_code == self.set_table.id_of(normalize_set_name(name)))
+
+    def encore_sets(self):
+        codes = [code for code, name in enumerate(self.set_names) if is_encore(str(name))]
+        return np.flatnonzero(np.isin(self.set_code, codes))
+
+    # Times each song was played, indexed by song ID
+    def song_counts(self):
+        return np.bincount(self.song_id, minlength=len(self.song_names))
+
+    def locations(self):
+        return self.location_names[self.location_code].astype(object)
+
+    def setlists(self):
+        names = self.song_names[self.song_id].astype(object).tolist()
+        offsets = self.song_offsets.tolist()
+        return [names[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def store_path(xml_file, store_dir=STORE_DIR):
+    name = os.path.splitext(os.path.basename(xml_file))[0]
+    return os.path.join(store_dir, name)
+
+
+# The store is stale if it is missing, from an older layout, or older than its XML
+def is_stale(xml_file, path):
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_file):
+        return True
+
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    return meta.get('version') != STORE_VERSION or os.path.getmtime(xml_file) > meta['source_mtime']
+
+
+# One-time XML -> columnar compile
+def compile_store(xml_file, store_dir=STORE_DIR):
+    columns = load_columns(xml_file)
+
+    # Intern spelling variants onto shared integer IDs
+    locations = SymbolTable(unknown_name=UNKNOWN_LOCATION)
+    songs = SymbolTable()
+    location_code = locations.intern_many(columns['location'])
+    song_id = songs.intern_many(columns['song'])
+    set_names = SymbolTable(unknown_name='')
+    set_code = set_names.intern_many(columns['set_name'])
+    dates = pd.to_datetime(pd.Series(columns['date']), format='mixed', errors='coerce')
+
+    arrays = {
+        'date': dates.to_numpy(dtype='datetime64[D]'),
+        'location_code': location_code,
+        'location_names': np.array(locations.names, dtype=str),
+        'song_id': song_id,
+        'song_offsets': columns['song_offsets'],
+        'song_names': np.array(songs.names, dtype=str),
+        'segue': columns['segue'],
+        'set_code': set_code.astype(np.int16),
+        'set_names': np.array(set_names.names, dtype=str),
+        'set_offsets': columns['set_offsets'],
+        'show_set_offsets': columns['show_set_offsets']
+    }
+    meta = {
+        'version': STORE_VERSION,
+        'source': xml_file,
+        'source_mtime': os.path.getmtime(xml_file),
+        'num_shows': len(columns['date'])
+    }
+
+    # Build next to the old store and swap it in so readers never see a half-written one
+    path = store_path(xml_file, store_dir)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Load the store for an XML file, recompiling it first if the XML is newer
+def load_store(xml_file, store_dir=STORE_DIR, mmap=True):
+    path = store_path(xml_file, store_dir)
+    if is_stale(xml_file, path):
+        compile_store(xml_file, store_dir)
+
+    arrays = {}
+    for name in ARRAYS:
+        arrays[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    return ShowStore(arrays, meta)
+
+
+# One row per show, the layout stats.py and predictions.py work with
+def store_to_dataframe(store):
+    return pd.DataFrame({
+        'date': pd.to_datetime(np.asarray(store.date)),
+        'location': store.locations(),
+        'num_songs': store.num_songs,
+        'setlist': store.setlists()
+    })
+
+
+# The setlist.fm XML lists a few shows twice under one date and venue, sometimes once with
+# a partial setlist. Keep only the copy with the most songs (the rule merge_sources applies
+# within a source) so every model and feature table sees each show once.
+def drop_duplicate_shows(df):
+    fullest_first = df['setlist'].str.len().sort_values(ascending=False, kind='stable').index
+    duplicate = df.loc[fullest_first].duplicated(['date', 'location'])
+    return df.drop(index=duplicate.index[duplicate]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    for xml_file in sorted(glob.glob(XML_GLOB)):
+        path = compile_store(xml_file)
+        print(f"Compiled {xml_file} -> {path}")
@@ -1,19 +1,12 @@
-from bs4 import BeautifulSoup
-from tqdm import tqdm
-import matplotlib.pyplot as plt
 import pandas as pd
 from collections import Counter
-import seaborn as sns
-from geopy.geocoders import Nominatim
-import geopandas as gpd
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.drawing.image import Image as ExcelImage
+import numpy as np
 import os
-
-# Create a folder to store the plots
-if not os.path.exists('plots'):
-    os.makedirs('plots')
+from export import export_table
+from covers import label_cover_songs, load_cover_catalog, make_cover_catalog
+from show_loader import iter_shows
+from show_store import ShowStore, load_store, store_to_dataframe
+from aggregates import as_aggregates, compute_aggregates
 
 # Read in the cover songs
 def read_cover_songs(file_path):
@@ -23,27 +16,20 @@ def read_cover_songs(file_path):
 
 # Parse the xml file of all the shows
 def parse_xml(xml_file):
-    with open(xml_file, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file, 'lxml-xml')
-
-        shows = []
-
-        # Extract show details
-        for show in soup.find_all('show'):
-            date = show.find('date').get_text()
-            location = show.find('location').get_text()
-            setlist = [song.get_text() for song in show.find_all('song')]
-            shows.append({
-                'date': date,
-                'location': location,
-                'setlist': setlist,
-                'num_songs': len(setlist)
-            })
+    shows = []
+
+    # Extract show details
+    for show in iter_shows(xml_file):
+        show['num_songs'] = len(show['setlist'])
+        shows.append(show)
 
     return shows
 
-# create the dataframe
+# create the dataframe, either from parsed shows or straight from a compiled show store
 def create_dataframe(shows):
+    if isinstance(shows, ShowStore):
+        return store_to_dataframe(shows)
+
     data = {
         'date': [],
         'location': [],
@@ -61,34 +47,33 @@ def create_dataframe(shows):
 
 # Get stats for cover songs
 def get_cover_song_stats(df, cover_songs):
-    cover_song_counts = Counter()
+    cover_catalog = make_cover_catalog(cover_songs)
 
-    normalized_cover_songs = [song.lower().strip() for song in cover_songs]
+    # Label every performance at once, then count the covers in setlist order
+    all_songs = df['setlist'].explode().dropna()
+    is_cover = label_cover_songs(all_songs, cover_catalog)
 
-    for setlist in df['setlist']:
-        for song in setlist:
-            normalized_song = song.lower().strip()
-
-            if normalized_song in normalized_cover_songs:
-                cover_song_counts[song] += 1 
-
-    return cover_song_counts
+    return Counter(all_songs[is_cover])
 
 # Plot functions that save the plots as PNG files
-def save_plot_to_file(plot_func, df, filename):
-    plot_func(df)
+def save_plot_to_file(plot_func, agg, filename):
+    import matplotlib.pyplot as plt
+
+    plot_func(agg)
+    os.makedirs('plots', exist_ok=True)
     filepath = os.path.join('plots', filename)
     plt.savefig(filepath)
     plt.close()
     return filepath
 
 # Plot 1: number of songs per show
-def plot_num_songs_per_show(df):
-    df['date'] = pd.to_datetime(df['date'])
-    df_sorted = df.sort_values('date')
+def plot_num_songs_per_show(agg):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
 
     plt.figure(figsize=(10, 6))
-    plt.bar(df_sorted['date'], df_sorted['num_songs'])
+    plt.bar(agg.sorted_dates, agg.sorted_num_songs)
     plt.xlabel('Date')
     plt.ylabel('Number of Songs')
     plt.title('Number of Songs Per Show')
@@ -97,15 +82,13 @@ def plot_num_songs_per_show(df):
     #plt.show()
 
 # Plot 2: Most frequently played songs
-def plot_most_frequent_songs(df):
-    # Flatten all setlists into a single list of songs
-    all_songs = [song for setlist in df['setlist'] for song in setlist]
-    
-    # Use Counter to get the frequency of each song
-    song_counter = Counter(all_songs)
-    
+def plot_most_frequent_songs(agg):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
+
     # Get the top 10 most frequently played songs
-    most_common_songs = song_counter.most_common(20)
+    most_common_songs = agg.song_counts.most_common(20)
     
     # Split the most common songs into two lists: names and counts
     song_names, song_counts = zip(*most_common_songs)
@@ -120,9 +103,13 @@ def plot_most_frequent_songs(df):
     #plt.show()
 
 # Plot 3: Top 20 locations by number of shows
-def plot_song_distribution_across_locations_bar(df, top_n=20):
+def plot_song_distribution_across_locations_bar(agg, top_n=20):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
+
     # Get the top N locations
-    location_counts = df['location'].value_counts().head(top_n)
+    location_counts = agg.location_counts.head(top_n)
 
     # Plot a horizontal bar chart
     plt.figure(figsize=(10, 6))
@@ -134,14 +121,16 @@ def plot_song_distribution_across_locations_bar(df, top_n=20):
     #plt.show()
 
 # Plot 4: Song repetition over time
-def plot_song_repetition_over_time(df):
-    # Create a list to track whether the song was played at each show
-    song_name = 'Disco'
-    dates = pd.to_datetime(df['date'])
-    song_played = [1 if song_name in setlist else 0 for setlist in df['setlist']]
+def plot_song_repetition_over_time(agg, song_name='Disco'):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
+
+    # Whether the song was played at each show
+    song_played = agg.song_played(song_name)
     
     plt.figure(figsize=(10, 6))
-    plt.plot(dates, song_played, marker='o')
+    plt.plot(agg.dates, song_played, marker='o')
     plt.xlabel('Date')
     plt.ylabel(f'{song_name} Played (1 = Yes, 0 = No)')
     plt.title(f'Repetition of "{song_name}" Over Time')
@@ -149,9 +138,11 @@ def plot_song_repetition_over_time(df):
     plt.tight_layout()
 
 # Plot 5: Most popular closing songs
-def plot_most_popular_closing_songs(df):
-    closing_songs = [setlist[-1] for setlist in df['setlist'] if setlist]  # Get last song from each setlist
-    closing_song_counts = Counter(closing_songs).most_common(10)
+def plot_most_popular_closing_songs(agg):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
+    closing_song_counts = agg.closer_counts.most_common(10)
 
     song_names, song_counts = zip(*closing_song_counts)
 
@@ -164,9 +155,11 @@ def plot_most_popular_closing_songs(df):
     plt.tight_layout()
 
 # Plot 6: Most popular opening songs
-def plot_most_frequent_opening_songs(df):
-    opening_songs = [setlist[0] for setlist in df['setlist'] if setlist]  # Get first song from each setlist
-    opening_song_counts = Counter(opening_songs).most_common(10)
+def plot_most_frequent_opening_songs(agg):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
+    opening_song_counts = agg.opener_counts.most_common(10)
 
     song_names, song_counts = zip(*opening_song_counts)
 
@@ -179,12 +172,13 @@ def plot_most_frequent_opening_songs(df):
     plt.tight_layout()
 
 # Plot 7: Number of songs per show over time
-def plot_num_songs_trend_over_time(df):
-    df['date'] = pd.to_datetime(df['date'])
-    df_sorted = df.sort_values('date')
+def plot_num_songs_trend_over_time(agg):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
 
     plt.figure(figsize=(10, 6))
-    plt.plot(df_sorted['date'], df_sorted['num_songs'], marker='o')
+    plt.plot(agg.sorted_dates, agg.sorted_num_songs, marker='o')
     plt.xlabel('Date')
     plt.ylabel('Number of Songs')
     plt.title('Trend of Number of Songs Per Show Over Time')
@@ -192,12 +186,12 @@ def plot_num_songs_trend_over_time(df):
     plt.tight_layout()
 
 # Plot 8: Number of shows per location heat map
-def plot_shows_heatmap(df, top_n=20):
-    # Add month column to the DataFrame
-    df['month'] = pd.to_datetime(df['date']).dt.month
+def plot_shows_heatmap(agg, top_n=20):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-    # Group by location and month and count shows
-    location_month_counts = df.groupby(['location', 'month']).size().unstack(fill_value=0)
+    agg = as_aggregates(agg)
+    location_month_counts = agg.location_month_counts
 
     # Limit to top N locations based on total number of shows
     top_locations = location_month_counts.sum(axis=1).nlargest(top_n).index
@@ -221,12 +215,13 @@ def plot_shows_heatmap(df, top_n=20):
     plt.tight_layout()
 
 # Plot 9: Least frequently played songs
-def plot_least_frequent_songs(df):
+def plot_least_frequent_songs(agg):
+    import matplotlib.pyplot as plt
+
+    agg = as_aggregates(agg)
     num_songs = 20
-    all_songs = [song for setlist in df['setlist'] for song in setlist]
-    
-    song_counter = Counter(all_songs)
-    least_common_songs = song_counter.most_common()[:-num_songs-1:-1]
+
+    least_common_songs = agg.song_counts.most_common()[:-num_songs-1:-1]
     song_names, song_counts = zip(*least_common_songs) if least_common_songs else ([], [])
 
     # plot chart
@@ -241,6 +236,8 @@ def plot_least_frequent_songs(df):
 
 # Plot 10: Most popular cover songs
 def plot_popular_cover_songs(cover_song_counts, top_n=20):
+    import matplotlib.pyplot as plt
+
     most_common_covers = cover_song_counts.most_common(top_n)
     if most_common_covers:
         song_names, play_counts = zip(*most_common_covers)
@@ -255,6 +252,8 @@ def plot_popular_cover_songs(cover_song_counts, top_n=20):
 
 # Plot 11: Least popular cover song
 def plot_least_popular_cover_songs(cover_song_counts):
+    import matplotlib.pyplot as plt
+
     num_songs = 20
     least_common_covers = cover_song_counts.most_common()[:-num_songs-1:-1]
     if least_common_covers:
@@ -268,35 +267,46 @@ def plot_least_popular_cover_songs(cover_song_counts):
         plt.xticks(rotation=90)
         plt.tight_layout()
 
+# Plot 12: Most common segues (songs played back to back)
+def plot_most_common_segues(transitions, top_n=20):
+    import matplotlib.pyplot as plt
+
+    segues = transitions.top_segues(top_n)
+    if segues:
+        labels = [f"{first} > {then}" for first, then, _ in segues]
+        counts = [count for _, _, count in segues]
+
+        plt.figure(figsize=(10, 8))
+        plt.barh(labels[::-1], counts[::-1], color='purple')
+        plt.xlabel('Times Played Back to Back')
+        plt.ylabel('Segue')
+        plt.title(f'Top {top_n} Most Common Segues')
+        plt.tight_layout()
+
+
+def get_location_coordinates(location_name, geocoder=None):
+    from geocode import geocode_locations
 
-def get_location_coordinates(location_name):
-    geolocator = Nominatim(user_agent="location_mapper")
-    location = geolocator.geocode(location_name)
-    if location:
-        return location.latitude, location.longitude
-    else:
-        return None, None
+    return geocode_locations([location_name], geocoder)[location_name]
 
-def plot_us_map_with_locations(df):
-    # Load the shapefile for the United States from the local path
-    world = gpd.read_file('/Users/brooksseale/WSP/ne_110m_admin_0_countries')
-    us = world[world['NAME'] == "United States"]
+def plot_us_map_with_locations(df, geocoder=None):
+    import matplotlib.pyplot as plt
+    from tqdm import tqdm
 
-    # Create a new column for coordinates (latitude and longitude)
-    df['latitude'] = None
-    df['longitude'] = None
+    # geopandas is slow to import, so only the map pulls it in
+    from regions import assign_countries, load_countries, venue_table
 
-    # Convert location names to coordinates
-    for idx, row in tqdm(df.iterrows(), desc="10/10: Plotting locations"):
-        lat, lon = get_location_coordinates(row['location'])
-        df.at[idx, 'latitude'] = lat
-        df.at[idx, 'longitude'] = lon
+    # Load the (cached) country outlines bundled with the repo
+    countries = load_countries()
+    us = countries[countries['ADM0_A3'] == 'USA']
 
-    # Filter rows with valid coordinates (remove None or NaN)
-    df = df.dropna(subset=['latitude', 'longitude'])
+    # One point per venue, geocoded once per venue (cached on disk across runs)
+    venues = venue_table(df, geocoder, progress=lambda locations: tqdm(locations, desc="10/10: Geocoding new locations"))
+    venues = assign_countries(venues, countries)
+    venues = venues[venues['country_code'] == 'USA']
 
     # If no valid coordinates are available, raise an error
-    if df.empty:
+    if venues.empty:
         print("No valid locations to plot.")
         return
 
@@ -304,9 +314,9 @@ def plot_us_map_with_locations(df):
     fig, ax = plt.subplots(figsize=(10, 10))
     us.plot(ax=ax, color='whitesmoke', edgecolor='black')
 
-    # Scatter plot for the locations based on latitude and longitude
-    sizes = df['num_songs'] * 10  # Scale marker sizes based on the number of shows
-    df.plot(kind='scatter', x='longitude', y='latitude', s=sizes, ax=ax, color='blue', alpha=0.6)
+    # Scatter plot for the venues based on latitude and longitude
+    sizes = venues['num_shows'] * 10  # Scale marker sizes based on the number of shows
+    ax.scatter(venues['longitude'], venues['latitude'], s=sizes, color='blue', alpha=0.6)
 
     # Explicitly set the aspect ratio to 'equal' to prevent aspect errors
     ax.set_aspect('equal')
@@ -318,6 +328,9 @@ def plot_us_map_with_locations(df):
 
 # Create the Excel file and insert images
 def export_plots_to_excel(plot_files):
+    from openpyxl import Workbook
+    from openpyxl.drawing.image import Image as ExcelImage
+
     # Create a new Excel workbook
     wb = Workbook()
     ws = wb.active
@@ -331,108 +344,79 @@ def export_plots_to_excel(plot_files):
     # Save the workbook
     wb.save('show_plots.xlsx')
 
-# Create Excel file with all of the show data
-def create_excel_with_show_data(df):
-    all_rows = []
-
-    for index, row in df.iterrows():
-        for song in row['setlist']:
-            all_rows.append({
-                'Location': row['location'],
-                'Date': row['date'],
-                'Song': song
-            })
+# One row per song performance: Location, Date, Song
+def explode_setlists(df):
+    song_df = df[['location', 'date', 'setlist']].explode('setlist')
+    song_df = song_df.dropna(subset=['setlist']).reset_index(drop=True)
+    return song_df.rename(columns={'location': 'Location', 'date': 'Date', 'setlist': 'Song'})
 
-    # Song DF
-    song_df = pd.DataFrame(all_rows)
+# Count num times each song played, on every row of that song
+def add_times_played(song_df):
+    song_df['Times Played'] = song_df.groupby('Song')['Song'].transform('size')
+    return song_df
 
-    # Count num times song played
-    song_counter = Counter(song_df['Song'])
-    song_df["Times Played"] = song_df['Song'].apply(lambda x: song_counter[x])
+# Build the rows for the all show data sheet
+def build_show_data_frame(df):
+    song_df = add_times_played(explode_setlists(df))
 
     # Sort df by song freq
-    song_df_sorted = song_df.sort_values(by='Times Played', ascending=False)
-
-    # Create xl
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'All Show Data'
+    return song_df.sort_values(by='Times Played', ascending=False)
 
-    # Write df to excel
-    for row in dataframe_to_rows(song_df_sorted, index=False, header=False):
-        ws.append(row)
+# Create Excel file with all of the show data (plus csv/parquet copies)
+def create_excel_with_show_data(df, formats=('xlsx', 'csv', 'parquet')):
+    song_df_sorted = build_show_data_frame(df)
 
-    wb.save('all_show_data.xlsx')
+    # Stream df to excel
+    return export_table(song_df_sorted, 'all_show_data.xlsx', 'All Show Data', header=False, formats=formats)
 
 def get_last_three_show_dates(df):
-    last_three_show_dates = []
-    count = 0
-
-    for index, row in df.iterrows():
-        if count < 3:  # Add 3 dates, not 2
-            last_three_show_dates.append(row['date'])
-            count += 1
-        else:
-            break  # Exit loop when 3 dates are added
-    
-    return last_three_show_dates
-
-def get_date_code(curr_date, last_three_show_dates):
-    for i in range(3):
-        if curr_date in last_three_show_dates[i]:
-            return i + 1
-        
-    return 0
-
-# Create Excel file with all cover song data
-def create_excel_with_cover_songs(df, cover_songs):
-    all_rows = []
+    return df['date'].head(3).tolist()
+
+# 1, 2 or 3 for songs from the first three shows in df, 0 for everything else
+def get_date_codes(dates, last_three_show_dates):
+    conditions = [dates == date for date in last_three_show_dates]
+    return np.select(conditions, range(1, len(conditions) + 1), default=0)
+
+# Build the rows for the cover songs sheet
+def build_cover_song_frame(df, cover_songs):
     last_three_show_dates = get_last_three_show_dates(df)
+    cover_catalog = make_cover_catalog(cover_songs)
 
-    normalized_cover_songs = [song.lower().strip() for song in cover_songs]
-
-    for index, row in df.iterrows():
-        for song in row['setlist']:
-            normalized_song = song.lower().strip()
-
-            if normalized_song in normalized_cover_songs:
-                all_rows.append({
-                    'Location': row['location'],
-                    'Date': row['date'],
-                    'Song': song,
-                    'Song Type': 'Cover',
-                    'Recently Played': get_date_code(row['date'], last_three_show_dates)
-                })
-            else:
-                all_rows.append({
-                    'Location': row['location'],
-                    'Date': row['date'],
-                    'Song': song,
-                    'Song Type': 'Original',
-                    'Recently Played': get_date_code(row['date'], last_three_show_dates)
-                })
-
-    cover_song_df = pd.DataFrame(all_rows)
+    cover_song_df = explode_setlists(df)
+    is_cover = label_cover_songs(cover_song_df['Song'], cover_catalog)
+    cover_song_df['Song Type'] = np.where(is_cover, 'Cover', 'Original')
+    cover_song_df['Recently Played'] = get_date_codes(cover_song_df['Date'], last_three_show_dates)
     cover_song_df['Date'] = pd.to_datetime(cover_song_df['Date'], errors='coerce')
 
     # Count how many times each song was played
-    song_counter = Counter(cover_song_df['Song'])
-    cover_song_df["Times Played"] = cover_song_df['Song'].apply(lambda x: song_counter[x])
+    add_times_played(cover_song_df)
 
     # Sort the DataFrame by the frequency of times played
-    cover_song_df_sorted = cover_song_df.sort_values(by='Times Played', ascending=False)
-
-    # Create the Excel workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Cover Songs Data'
-
-    # Write the DataFrame to Excel
-    for row in dataframe_to_rows(cover_song_df_sorted, index=False, header=True):
-        ws.append(row)
-
-    # Save the Excel workbook
-    wb.save('all_songs_data.xlsx')
+    return cover_song_df.sort_values(by='Times Played', ascending=False)
+
+# Create Excel file with all cover song data (plus csv/parquet copies)
+def create_excel_with_cover_songs(df, cover_songs, formats=('xlsx', 'csv', 'parquet')):
+    cover_song_df_sorted = build_cover_song_frame(df, cover_songs)
+
+    # Stream the DataFrame to Excel
+    return export_table(cover_song_df_sorted, 'all_songs_data.xlsx', 'Cover Songs Data', header=True, formats=formats)
+
+# Where every song stands in the rotation going into the next show, from the feature store
+def get_song_rotation_stats(features):
+    next_show = features.next_show_features()
+    rotation_df = pd.DataFrame({
+        'Song': features.songs,
+        'Times Played': features.played.sum(axis=0),
+        'Shows Since Played': next_show[:, 0].astype(int),
+        'Play Rate (Last 20)': next_show[:, 1],
+        'Played In Last 3': next_show[:, 2].astype(bool)
+    })
+    return rotation_df.sort_values(by='Times Played', ascending=False)
+
+# Create Excel file with the rotation stats (plus csv/parquet copies)
+def create_excel_with_song_rotation(features, formats=('xlsx', 'csv', 'parquet')):
+    rotation_df = get_song_rotation_stats(features)
+    return export_table(rotation_df, 'song_rotation.xlsx', 'Song Rotation', header=True, formats=formats)
 
 def get_html_from_excel_table(file, excel_sheet_name):
     df = pd.read_excel(file, sheet_name=excel_sheet_name)
@@ -440,18 +424,23 @@ def get_html_from_excel_table(file, excel_sheet_name):
 
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from transitions import update_transitions
 
     # Read in cover songs
     cover_songs_file = 'txt_files/all_covers.txt'
-    cover_songs = read_cover_songs(cover_songs_file)
+    cover_songs = load_cover_catalog(cover_songs_file)
 
-    # Parse the XML file
+    # Load the compiled show store (rebuilt automatically when the XML changes)
     xml_file = 'xml_files/allshows_setlistfm.xml'
-    shows = parse_xml(xml_file)
+    shows = load_store(xml_file)
 
     # Create a DataFrame from the shows
     df = create_dataframe(shows)
 
+    # Every plot below reads from these, so the setlists are only walked once
+    agg = compute_aggregates(df, cover_songs)
+
     # create_excel_with_cover_songs(df, cover_songs)
 
     excel_file = 'excel_files/WSP_All_Show_Data.xlsx'
@@ -460,53 +449,55 @@ if __name__ == "__main__":
 
     #create_excel_with_show_data(df)
 
-    # Save plots to PNG files
+    # Save plots to PNG files (render_plots.py does all of them headlessly, in parallel)
     # plot_files = []
-    # plot_files.append(save_plot_to_file(plot_num_songs_per_show, df, 'plot_num_songs_per_show.png'))
-    # plot_files.append(save_plot_to_file(plot_most_frequent_songs, df, 'plot_most_frequent_songs.png'))
-    # plot_files.append(save_plot_to_file(plot_song_distribution_across_locations_bar, df, 'plot_song_distribution_across_locations_bar.png'))
-    # plot_files.append(save_plot_to_file(plot_song_repetition_over_time, df, 'plot_song_repetition_over_time.png'))
-    # plot_files.append(save_plot_to_file(plot_most_popular_closing_songs, df, 'plot_most_popular_closing_songs.png'))
-    # plot_files.append(save_plot_to_file(plot_most_frequent_opening_songs, df, 'plot_most_frequent_opening_songs.png'))
-    # plot_files.append(save_plot_to_file(plot_num_songs_trend_over_time, df, 'plot_num_songs_trend_over_time.png'))
-    # plot_files.append(save_plot_to_file(plot_shows_heatmap, df, 'plot_shows_heatmap.png'))
+    # plot_files.append(save_plot_to_file(plot_num_songs_per_show, agg, 'plot_num_songs_per_show.png'))
+    # plot_files.append(save_plot_to_file(plot_most_frequent_songs, agg, 'plot_most_frequent_songs.png'))
+    # plot_files.append(save_plot_to_file(plot_song_distribution_across_locations_bar, agg, 'plot_song_distribution_across_locations_bar.png'))
+    # plot_files.append(save_plot_to_file(plot_song_repetition_over_time, agg, 'plot_song_repetition_over_time.png'))
+    # plot_files.append(save_plot_to_file(plot_most_popular_closing_songs, agg, 'plot_most_popular_closing_songs.png'))
+    # plot_files.append(save_plot_to_file(plot_most_frequent_opening_songs, agg, 'plot_most_frequent_opening_songs.png'))
+    # plot_files.append(save_plot_to_file(plot_num_songs_trend_over_time, agg, 'plot_num_songs_trend_over_time.png'))
+    # plot_files.append(save_plot_to_file(plot_shows_heatmap, agg, 'plot_shows_heatmap.png'))
 
     # Export plots to Excel
     #export_plots_to_excel(plot_files)
 
     # Plot 1
-    plot_num_songs_per_show(df)
+    plot_num_songs_per_show(agg)
 
     # Plot 2
-    plot_most_frequent_songs(df)
+    plot_most_frequent_songs(agg)
 
     # Plot 3
-    plot_song_distribution_across_locations_bar(df, top_n=20)
+    plot_song_distribution_across_locations_bar(agg, top_n=20)
 
     # Plot 4
-    plot_song_repetition_over_time(df)
+    plot_song_repetition_over_time(agg)
 
     # Plot 5
-    plot_most_popular_closing_songs(df)
+    plot_most_popular_closing_songs(agg)
 
     # Plot 6
-    plot_most_frequent_opening_songs(df)
+    plot_most_frequent_opening_songs(agg)
 
     # Plot 7
-    plot_num_songs_trend_over_time(df)
+    plot_num_songs_trend_over_time(agg)
 
     # Plot 8
-    plot_shows_heatmap(df, top_n=20)
+    plot_shows_heatmap(agg, top_n=20)
 
     # Plot 9
-    plot_least_frequent_songs(df)
+    plot_least_frequent_songs(agg)
 
     # Plot 10 
-    cover_song_counts = get_cover_song_stats(df, cover_songs)
-    plot_popular_cover_songs(cover_song_counts, top_n=20)
+    plot_popular_cover_songs(agg.cover_song_counts, top_n=20)
 
     # Plot 11
-    plot_least_popular_cover_songs(cover_song_counts)
+    plot_least_popular_cover_songs(agg.cover_song_counts)
+
+    # Plot 12
+    plot_most_common_segues(update_transitions(xml_file), top_n=20)
 
     #plot_us_map_with_locations(df)
 
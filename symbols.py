@@ -0,0 +1,113 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN_SONG = 'Unknown song'
+UNKNOWN_LOCATION = 'Unknown location'
+
+# Different spellings that should all count as the same thing, by normalized key
+ALIASES = {
+    '': 'unknown song',
+    'unknown': 'unknown song',
+    'unknown song': 'unknown song',
+    'unknown date': 'unknown date',
+    'unknown location': 'unknown location',
+    'na': 'unknown location'
+}
+
+QUOTES = str.maketrans({'‘': "'", '’': "'", '“': '"', '”': '"', '–': '-', '—': '-'})
+PUNCTUATION = re.compile(r"[^\w\s/]")
+WHITESPACE = re.compile(r"\s+")
+
+# Set headings as both sources write them: "Set 1:", "Set I", "Set Two", "Encore:", "Encore 2"
+SET_HEADING = re.compile(r"^(set|encore)\s*(\w*)$")
+SET_NUMBERS = {'': '', '1': '1', 'i': '1', 'one': '1', '2': '2', 'ii': '2', 'two': '2',
+               '3': '3', 'iii': '3', 'three': '3', '4': '4', 'iv': '4', 'four': '4'}
+ENCORE = 'Encore'
+
+# A trailing ">" (or "->") on a song title means it segued straight into the next song
+SEGUE_MARKER = re.compile(r"\s*-?>\s*$")
+
+
+# Canonical lookup key: case, whitespace, quote style and punctuation don't matter,
+# so "Lawyers, Guns and Money" and "Lawyers Guns And Money" share one key
+def normalize_name(name):
+    key = unicodedata.normalize('NFKC', name).translate(QUOTES).casefold()
+    key = key.replace('&', ' and ')
+    key = PUNCTUATION.sub('', key)
+    key = WHITESPACE.sub(' ', key).strip()
+    return ALIASES.get(key, key)
+
+
+# Canonical set name: "Set 1", "Set 2", ..., "Encore", "Encore 2". Unrecognized headings
+# keep their own text, and shows without set headings have one unnamed ("") set.
+def normalize_set_name(name):
+    name = WHITESPACE.sub(' ', (name or '').strip().rstrip(':')).strip()
+    match = SET_HEADING.match(name.casefold())
+    if not match or match.group(2) not in SET_NUMBERS:
+        return name
+
+    kind, number = match.groups()
+    number = SET_NUMBERS[number]
+    if kind == 'encore':
+        return ENCORE if number in ('', '1') else f"{ENCORE} {number}"
+    return f"Set {number}" if number else 'Set 1'
+
+
+def is_encore(set_name):
+    return set_name.startswith(ENCORE)
+
+
+# (title, segued into the next song) with any trailing segue marker removed
+def split_segue(title):
+    title = title.strip()
+    marker = SEGUE_MARKER.search(title)
+    if marker and marker.start() > 0:
+        return title[:marker.start()], True
+    return title, False
+
+
+# Maps names to dense integer IDs (0, 1, 2, ...) by their normalized key. The first
+# spelling seen for a key is kept as its display name.
+class SymbolTable:
+    def __init__(self, names=(), unknown_name=UNKNOWN_SONG):
+        self.names = []
+        self.ids = {}
+        self.unknown_name = unknown_name
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self.ids
+
+    def intern(self, name):
+        key = normalize_name(name)
+        symbol_id = self.ids.get(key)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.ids[key] = symbol_id
+            self.names.append(name.strip() or self.unknown_name)
+        return symbol_id
+
+    # Intern a whole column at once; each distinct raw spelling is only normalized once
+    def intern_many(self, names):
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        unique_ids = np.array([self.intern(name) for name in uniques], dtype=np.int32)
+        return unique_ids[codes] if len(codes) else np.zeros(0, dtype=np.int32)
+
+    def id_of(self, name, default=-1):
+        return self.ids.get(normalize_name(name), default)
+
+    def ids_of(self, names, default=-1):
+        return np.array([self.id_of(name, default) for name in names], dtype=np.int32)
+
+    def name_of(self, symbol_id):
+        return self.names[symbol_id]
+
+    def names_of(self, symbol_ids):
+        return np.array(self.names, dtype=object)[np.asarray(symbol_ids)]
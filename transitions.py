@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from feature_store import chronological_shows
+from show_store import store_path
+
+TRANSITION_VERSION = 4
+
+# Trigrams are packed into one int64 as (a, b, c) with this many bits per song ID,
+# so keys stay valid as the vocabulary grows
+SONG_BITS = 21
+SONG_MASK = (1 << SONG_BITS) - 1
+
+
+def pack_trigrams(a, b, c):
+    return (np.asarray(a, dtype=np.int64) << (2 * SONG_BITS)) | (np.asarray(b, dtype=np.int64) << SONG_BITS) | np.asarray(c, dtype=np.int64)
+
+
+def unpack_trigrams(keys):
+    return keys >> (2 * SONG_BITS), (keys >> SONG_BITS) & SONG_MASK, keys & SONG_MASK
+
+
+# Song-order statistics for a list of setlists, all in one pass over the flat song-ID
+# array: song -> next song counts (CSR), sorted trigram keys with their counts, and how
+# often each song opened or closed a show
+def count_transitions(song_id, offsets, num_songs):
+    song_id = np.asarray(song_id, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    show_of = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Pairs and triples only count when every song is in the same show
+    pair = show_of[1:] == show_of[:-1]
+    bigrams = csr_matrix((np.ones(pair.sum(), dtype=np.int32), (song_id[:-1][pair], song_id[1:][pair])),
+                         shape=(num_songs, num_songs))
+    bigrams.sum_duplicates()
+
+    triple = pair[1:] & pair[:-1]
+    trigram_keys, trigram_counts = np.unique(
+        pack_trigrams(song_id[:-2][triple], song_id[1:-1][triple], song_id[2:][triple]), return_counts=True)
+
+    played = lengths > 0
+    openers = np.bincount(song_id[offsets[:-1][played]], minlength=num_songs)
+    closers = np.bincount(song_id[offsets[1:][played] - 1], minlength=num_songs)
+
+    return bigrams, trigram_keys, trigram_counts.astype(np.int64), openers, closers
+
+
+# Add two sets of (sorted key, count) trigrams
+def merge_trigrams(keys, counts, new_keys, new_counts):
+    merged, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+    return merged, np.bincount(inverse, weights=np.concatenate([counts, new_counts]), minlength=len(merged)).astype(np.int64)
+
+
+def _resize(matrix, num_songs):
+    matrix = matrix.tocoo()
+    return csr_matrix((matrix.data, (matrix.row, matrix.col)), shape=(num_songs, num_songs))
+
+
+def _pad(counts, num_songs):
+    return np.concatenate([counts, np.zeros(num_songs - len(counts), dtype=counts.dtype)])
+
+
+# Transition counts over every show in an XML file, oldest first
+class TransitionTable:
+    def __init__(self, songs, show_keys, bigrams, trigram_keys, trigram_counts, openers, closers):
+        self.songs = songs
+        self.song_index = {song: i for i, song in enumerate(songs)}
+        self.show_keys = show_keys
+        self.show_index = set(show_keys)
+        self.bigrams = bigrams
+        self.trigram_keys = trigram_keys
+        self.trigram_counts = trigram_counts
+        self.openers = openers
+        self.closers = closers
+
+    @property
+    def num_shows(self):
+        return len(self.show_keys)
+
+    def song_ids(self, songs):
+        return [self.song_index[song] for song in songs if song in self.song_index]
+
+    # Counts of what followed a song, as a dense array over songs
+    def next_counts(self, song):
+        return self.bigrams[self.song_index[song]].toarray().ravel()
+
+    # P(next song | song); all zeros if the song never had anything after it
+    def next_probabilities(self, song):
+        counts = self.next_counts(song).astype(float)
+        total = counts.sum()
+        return counts / total if total else counts
+
+    # Counts of what followed the pair (first, second), from the trigram table
+    def next_after_pair(self, first, second):
+        counts = np.zeros(len(self.songs))
+        start = pack_trigrams(self.song_index[first], self.song_index[second], 0)
+        lo, hi = np.searchsorted(self.trigram_keys, [start, start + SONG_MASK + 1])
+        _, _, following = unpack_trigrams(self.trigram_keys[lo:hi])
+        counts[following] = self.trigram_counts[lo:hi]
+        return counts
+
+    def trigram_count(self, first, second, third):
+        key = pack_trigrams(self.song_index[first], self.song_index[second], self.song_index[third])
+        i = np.searchsorted(self.trigram_keys, key)
+        return int(self.trigram_counts[i]) if i < len(self.trigram_keys) and self.trigram_keys[i] == key else 0
+
+    # Most common back-to-back pairs as (song, next song, count)
+    def top_segues(self, top_n=20):
+        pairs = self.bigrams.tocoo()
+        top = np.argsort(-pairs.data, kind='stable')[:top_n]
+        return [(self.songs[pairs.row[i]], self.songs[pairs.col[i]], int(pairs.data[i])) for i in top]
+
+    def top_trigrams(self, top_n=20):
+        top = np.argsort(-self.trigram_counts, kind='stable')[:top_n]
+        first, second, third = unpack_trigrams(self.trigram_keys[top])
+        return [(self.songs[a], self.songs[b], self.songs[c], int(count))
+                for a, b, c, count in zip(first, second, third, self.trigram_counts[top])]
+
+    # Fold in shows (oldest first) that come after everything already counted
+    def add_shows(self, show_keys, setlists):
+        songs = list(self.songs)
+        song_index = dict(self.song_index)
+        flat = []
+        for setlist in setlists:
+            for song in setlist:
+                if song not in song_index:
+                    song_index[song] = len(songs)
+                    songs.append(song)
+                flat.append(song_index[song])
+        offsets = np.concatenate([[0], np.cumsum([len(setlist) for setlist in setlists], dtype=np.int64)])
+
+        num_songs = len(songs)
+        bigrams, trigram_keys, trigram_counts, openers, closers = count_transitions(flat, offsets, num_songs)
+
+        return TransitionTable(
+            songs, self.show_keys + list(show_keys),
+            _resize(self.bigrams, num_songs) + bigrams,
+            *merge_trigrams(self.trigram_keys, self.trigram_counts, trigram_keys, trigram_counts),
+            _pad(self.openers, num_songs) + openers,
+            _pad(self.closers, num_songs) + closers
+        )
+
+
+def empty_transition_table():
+    return TransitionTable([], [], csr_matrix((0, 0), dtype=np.int32), np.zeros(0, dtype=np.int64),
+                           np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+
+def transitions_dir(xml_file):
+    return os.path.join(store_path(xml_file), 'transitions')
+
+
+def save_transitions(table, path):
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    arrays = {
+        'bigram_data': table.bigrams.data,
+        'bigram_indices': table.bigrams.indices,
+        'bigram_indptr': table.bigrams.indptr,
+        'trigram_keys': table.trigram_keys,
+        'trigram_counts': table.trigram_counts,
+        'openers': table.openers,
+        'closers': table.closers
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': TRANSITION_VERSION, 'songs': table.songs, 'show_keys': table.show_keys}, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_transitions(path):
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != TRANSITION_VERSION:
+        return None
+
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"))
+              for name in ('bigram_data', 'bigram_indices', 'bigram_indptr', 'trigram_keys', 'trigram_counts', 'openers', 'closers')}
+    num_songs = len(meta['songs'])
+    bigrams = csr_matrix((arrays['bigram_data'], arrays['bigram_indices'], arrays['bigram_indptr']), shape=(num_songs, num_songs))
+    return TransitionTable(meta['songs'], meta['show_keys'], bigrams, arrays['trigram_keys'], arrays['trigram_counts'],
+                           arrays['openers'], arrays['closers'])
+
+
+# Bring the transition table up to date with the XML, counting only shows it hasn't
+# seen. Falls back to a full rebuild if an older show turns up.
+def update_transitions(xml_file):
+    path = transitions_dir(xml_file)
+    keys, setlists = chronological_shows(xml_file)
+
+    table = load_transitions(path) or empty_transition_table()
+    new_rows = [i for i, key in enumerate(keys) if key not in table.show_index]
+    if not new_rows:
+        return table
+
+    if new_rows[0] < table.num_shows:
+        table = empty_transition_table()
+        new_rows = list(range(len(keys)))
+
+    table = table.add_shows([keys[i] for i in new_rows], [setlists[i] for i in new_rows])
+    save_transitions(table, path)
+    return table
+
+
+if __name__ == "__main__":
+    import time
+    start = time.perf_counter()
+    table = update_transitions('xml_files/allshows_setlistfm.xml')
+    print(f"{table.num_shows} shows, {table.bigrams.nnz} distinct segues, {len(table.trigram_keys)} trigrams "
+          f"in {time.perf_counter() - start:.2f}s")
+    for first, then, count in table.top_segues(10):
+        print(f"  {count:5d}  {first} > {then}")
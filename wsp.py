@@ -0,0 +1,326 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Keep this module's own imports to the standard library: every subcommand imports
+# the heavy libraries it needs (pandas, matplotlib, sklearn, geopandas, ...) itself,
+# so `wsp crawl` never pays for sklearn and `wsp --help` pays for nothing.
+
+XML_FILE = 'xml_files/allshows_setlistfm.xml'
+COVERS_FILE = 'txt_files/all_covers.txt'
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Trivial commands should start well inside this
+STARTUP_BUDGET = 1.0
+
+
+def cmd_crawl(argv):
+    from setlistfm import main
+    main(argv)
+
+
+def cmd_compile(argv):
+    import glob
+    from show_store import XML_GLOB, compile_store, is_stale, store_path
+
+    parser = argparse.ArgumentParser(prog='wsp compile', description="Compile show XML files into columnar stores")
+    parser.add_argument('xml_files', nargs='*', help=f"XML files to compile (default: {XML_GLOB})")
+    parser.add_argument('--force', action='store_true', help="Recompile even if the store is up to date")
+    args = parser.parse_args(argv)
+
+    for xml_file in args.xml_files or sorted(glob.glob(XML_GLOB)):
+        if args.force or is_stale(xml_file, store_path(xml_file)):
+            print(f"Compiled {xml_file} -> {compile_store(xml_file)}")
+        else:
+            print(f"Up to date: {store_path(xml_file)}")
+
+
+def cmd_stats(argv):
+    from aggregates import compute_aggregates
+    from covers import load_cover_catalog
+    from set_stats import encore_frequency, set_tables, structured_shows
+    from show_store import load_store, store_to_dataframe
+    from transitions import update_transitions
+
+    parser = argparse.ArgumentParser(prog='wsp stats', description="Print summary stats for the shows")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--covers', default=COVERS_FILE)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--regions', action='store_true', help="Also break shows down by country and state (geocodes venues)")
+    parser.add_argument('--geocoder', default=None, help="Geocoder backend for --regions (nominatim or gazetteer)")
+    args = parser.parse_args(argv)
+
+    store = load_store(args.xml)
+    df = store_to_dataframe(store)
+    agg = compute_aggregates(df, load_cover_catalog(args.covers))
+
+    print(f"{agg.num_shows} shows, {df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d}, "
+          f"{len(agg.song_counts)} songs, {agg.locations.nunique()} venues")
+    tables = [
+        ('Most played songs', agg.song_counts.most_common(args.top)),
+        ('Most common openers', agg.opener_counts.most_common(args.top)),
+        ('Most common closers', agg.closer_counts.most_common(args.top)),
+        ('Most played covers', agg.cover_song_counts.most_common(args.top)),
+        ('Most visited venues', list(agg.location_counts.head(args.top).items())),
+        ('Most common segues', [(f"{first} > {then}", count)
+                                for first, then, count in update_transitions(args.xml).top_segues(args.top)])
+    ]
+    tables.extend(set_tables(store, args.top))
+    num_structured = len(structured_shows(store))
+    if num_structured:
+        print(f"{num_structured} shows with set headings, {encore_frequency(store):.0%} of them with an encore")
+    for title, rows in tables:
+        print(f"\n{title}:")
+        for name, count in rows:
+            print(f"  {count:5d}  {name}")
+
+    if args.regions:
+        from regions import assign_countries, region_stats, venue_table
+        venues = assign_countries(venue_table(df, args.geocoder))
+        print("\nShows by region:")
+        print(region_stats(venues).head(args.top).to_string(index=False))
+
+
+def cmd_query(argv):
+    import numpy as np
+    from setlist_index import load_index
+
+    parser = argparse.ArgumentParser(prog='wsp query', description="Look up shows through the setlist index")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--song', action='append', default=[], help="Shows with this song (repeat for AND)")
+    parser.add_argument('--before', nargs=2, metavar=('A', 'B'), help="Shows where A was played before B")
+    parser.add_argument('--segue', nargs=2, metavar=('A', 'B'), help="Shows where B came straight after A")
+    parser.add_argument('--from', dest='start', default=None, help="Earliest date (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', default=None, help="Latest date (YYYY-MM-DD)")
+    parser.add_argument('--venue', default=None)
+    args = parser.parse_args(argv)
+
+    index = load_index(args.xml)
+
+    # Every filter is a sorted array of show positions; the answer is their intersection
+    try:
+        filters = [index.shows_between(args.start, args.end, args.venue)]
+        if args.song:
+            filters.append(index.shows_with_all(*args.song))
+        if args.before:
+            filters.append(index.shows_where_before(*args.before))
+        if args.segue:
+            filters.append(index.shows_where_before(*args.segue, adjacent=True))
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    shows = filters[0]
+    for other in filters[1:]:
+        shows = np.intersect1d(shows, other, assume_unique=True)
+
+    for song in args.song:
+        first, last = index.first_played(song), index.last_played(song)
+        if first:
+            print(f"{song}: played at {index.play_count(song)} shows, first {first['date']:%Y-%m-%d} "
+                  f"({first['location']}), last {last['date']:%Y-%m-%d} ({last['location']})")
+    if len(shows):
+        print(index.to_frame(shows).to_string(index=False))
+    print(f"{len(shows)} shows")
+
+
+def cmd_merge(argv):
+    from merge_sources import main
+    main(argv)
+
+
+def cmd_plots(argv):
+    from render_plots import main
+    main(argv)
+
+
+def cmd_export(argv):
+    import stats
+    from covers import load_cover_catalog
+    from feature_store import update_feature_store
+    from show_store import load_store
+
+    parser = argparse.ArgumentParser(prog='wsp export', description="Export the show data sheets")
+    parser.add_argument('--sheets', nargs='+', default=['shows', 'covers', 'rotation'], choices=['shows', 'covers', 'rotation'])
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--covers', default=COVERS_FILE)
+    parser.add_argument('--formats', nargs='+', default=['xlsx', 'csv', 'parquet'], choices=['xlsx', 'csv', 'parquet'])
+    args = parser.parse_args(argv)
+
+    df = stats.create_dataframe(load_store(args.xml))
+    for sheet in args.sheets:
+        if sheet == 'shows':
+            paths = stats.create_excel_with_show_data(df, args.formats)
+        elif sheet == 'covers':
+            paths = stats.create_excel_with_cover_songs(df, load_cover_catalog(args.covers), args.formats)
+        else:
+            paths = stats.create_excel_with_song_rotation(update_feature_store(args.xml), args.formats)
+        print(f"{sheet}: {paths}")
+
+
+def cmd_predict(argv):
+    parser = argparse.ArgumentParser(prog='wsp predict', description="Predict the setlist for the next show")
+    parser.add_argument('--xml', default=XML_FILE)
+    parser.add_argument('--location', default="Enmarket Arena, Savannah, GA, USA")
+    parser.add_argument('--days-since-last-show', type=float, default=7,
+                        help="Days between the previous show and this one (most past gaps are 1-7)")
+    parser.add_argument('--max-songs', type=int, default=20)
+    parser.add_argument('--online', action='store_true', help="Use the incrementally updated model instead of the random forest")
+    parser.add_argument('--retrain', action='store_true', help="Ignore any cached model")
+    parser.add_argument('--ranked', action='store_true', help="List songs by probability instead of in running order")
+    parser.add_argument('--generate', action='store_true',
+                        help="Beam-search whole setlists over song transitions (length from past shows; ignores --max-songs)")
+    parser.add_argument('--candidates', type=int, default=1, help="How many setlists --generate prints")
+    parser.add_argument('--tour', action='append', default=[], metavar='DATE=LOCATION',
+                        help="Forecast a run of shows, each conditioned on the ones before it (repeat per date)")
+    args = parser.parse_args(argv)
+
+    if args.tour:
+        tour = []
+        for stop in args.tour:
+            date, _, location = stop.partition('=')
+            if not location:
+                parser.error(f"--tour expects DATE=LOCATION, got {stop!r}")
+            tour.append((location, date))
+        predict_tour_cmd(args, tour, parser)
+        return
+
+    if args.generate:
+        from predictions import get_trained_model
+        from setlist_generator import generate_next_show, load_generator
+        model = get_trained_model(args.xml, retrain=args.retrain)
+        setlists = generate_next_show(model, load_generator(args.xml), args.location, args.days_since_last_show,
+                                      num_setlists=args.candidates)
+        for rank, (songs, score) in enumerate(setlists, 1):
+            print(f"#{rank} ({len(songs)} songs, score {score:.3f}):")
+            for song in songs:
+                print(f"  {song}")
+        return
+
+    from transitions import update_transitions
+    transitions = None if args.ranked else update_transitions(args.xml)
+
+    if args.online:
+        from online_model import refresh
+        from predictions import order_setlist
+        model, _ = refresh(args.xml)
+        predicted_songs = model.predict(args.location, args.max_songs)
+        if transitions is not None:
+            predicted_songs = order_setlist(predicted_songs, transitions)
+    else:
+        from predictions import check_days_since_last_show, get_trained_model, predict_next_show
+        model = get_trained_model(args.xml, retrain=args.retrain)
+        check_days_since_last_show(model, args.days_since_last_show)
+        predicted_songs = predict_next_show(model['clf'], args.location, args.days_since_last_show, model['songs'],
+                                            model['location_encoder'], max_songs=args.max_songs,
+                                            song_features=model['song_features'], transitions=transitions)
+
+    print("Predicted songs for the next show:", predicted_songs)
+
+
+# `wsp predict --tour`: top songs per date, or whole generated setlists with --generate
+def predict_tour_cmd(args, tour, parser):
+    from predictions import get_trained_model, predict_tour
+
+    model = get_trained_model(args.xml, retrain=args.retrain)
+    try:
+        if args.generate:
+            from setlist_generator import generate_tour, load_generator
+            forecast = generate_tour(model, tour, load_generator(args.xml), num_candidates=args.candidates)
+        else:
+            from transitions import update_transitions
+            transitions = None if args.ranked else update_transitions(args.xml)
+            forecast = predict_tour(model, tour, max_songs=args.max_songs, transitions=transitions)
+    except ValueError as e:
+        parser.error(e.args[0])
+
+    for show in forecast:
+        score = f", score {show['score']:.3f}" if 'score' in show else ''
+        print(f"{show['date']} {show['location']} ({len(show['songs'])} songs{score}):")
+        for song in show['songs']:
+            print(f"  {song}")
+        for rank, songs in enumerate(show.get('alternatives', []), 2):
+            print(f"  #{rank}: {', '.join(songs)}")
+
+
+def cmd_search(argv):
+    from model_search import main
+    main(argv)
+
+
+def cmd_serve(argv):
+    from prediction_service import main
+    main(argv)
+
+
+# Name -> (handler, modules the handler imports, help). The module lists are what
+# bench-imports times, so keep them in step with the handlers.
+COMMANDS = {
+    'crawl': (cmd_crawl, ['setlistfm'], "Scrape new shows from setlist.fm"),
+    'compile': (cmd_compile, ['show_store'], "Compile XML files into columnar stores"),
+    'stats': (cmd_stats, ['aggregates', 'covers', 'set_stats', 'show_store', 'transitions'], "Print summary stats"),
+    'query': (cmd_query, ['numpy', 'setlist_index'], "Find shows by songs, song order, dates and venue"),
+    'merge': (cmd_merge, ['merge_sources'], "Merge every show source into one canonical XML file"),
+    'plots': (cmd_plots, ['render_plots'], "Render every plot to plots/ without a display"),
+    'export': (cmd_export, ['stats', 'covers', 'feature_store', 'show_store'], "Write the Excel/CSV/Parquet sheets"),
+    'predict': (cmd_predict, ['predictions'], "Predict the next setlist"),
+    'search': (cmd_search, ['model_search'], "Cross-validated model settings search"),
+    'serve': (cmd_serve, ['prediction_service'], "Serve predictions over HTTP"),
+}
+
+
+# Seconds a fresh interpreter takes to run `code`; best of `repeat` runs
+def time_python(code, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Startup cost of each subcommand: a fresh interpreter importing wsp plus everything
+# that subcommand imports before doing any work
+def cmd_bench_imports(argv):
+    parser = argparse.ArgumentParser(prog='wsp bench-imports', description="Time how long each subcommand takes to start")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baseline = time_python('pass', args.repeat)
+    print(f"{'python startup':>16s} {baseline:6.2f}s")
+    print(f"{'wsp --help':>16s} {time_python('import wsp', args.repeat):6.2f}s")
+
+    slow = []
+    for name, (_, modules, _) in COMMANDS.items():
+        if not modules:
+            continue
+        elapsed = time_python(f"import wsp, {', '.join(modules)}", args.repeat)
+        flag = '' if elapsed < STARTUP_BUDGET else '  (over budget)'
+        if flag:
+            slow.append(name)
+        print(f"{name:>16s} {elapsed:6.2f}s{flag}")
+
+    if slow:
+        print(f"Over the {STARTUP_BUDGET:.1f}s startup budget: {', '.join(slow)}")
+
+
+COMMANDS['bench-imports'] = (cmd_bench_imports, [], "Time each subcommand's startup imports")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='wsp', description="Widespread Panic setlist tools",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog='\n'.join(f"  {name:14s} {help}" for name, (_, _, help) in COMMANDS.items()))
+    parser.add_argument('command', choices=list(COMMANDS), metavar='command', help="One of the commands below")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="Arguments for the command (see wsp <command> --help)")
+    args = parser.parse_args(argv)
+
+    handler = COMMANDS[args.command][0]
+    handler(args.args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n<wsp_data>\n'
+XML_FOOTER = '</wsp_data>\n'
+SHOW_END = ' </show>\n'
+
+
+# Indented text element laid out the same way BeautifulSoup's prettify() does
+def _text_element(tag, text, depth, attributes=''):
+    indent = ' ' * depth
+    text = escape(text.strip())
+    if text:
+        return f"{indent}<{tag}{attributes}>\n{indent} {text}\n{indent}</{tag}>\n"
+    return f"{indent}<{tag}{attributes}>\n{indent}</{tag}>\n"
+
+
+def _song_elements(songs, segues, depth):
+    return [_text_element('song', song_title, depth, ' segue="true"' if segue else '')
+            for song_title, segue in zip(songs, segues)]
+
+
+# Serialize one show. Shows without set headings or segues come out byte for byte the way
+# the old BeautifulSoup save_to_xml wrote them; otherwise songs are grouped into
+# <set name="..."> elements and a song that segued into the next gets segue="true".
+def format_show(show):
+    parts = [' <show>\n', _text_element('location', show['location'], 2), _text_element('date', show['date'], 2)]
+
+    setlist = show['setlist']
+    segues = show.get('segues') or [False] * len(setlist)
+    sets = show.get('sets') or [('', len(setlist))]
+
+    if not setlist:
+        parts.append('  <setlist/>\n')
+    elif all(not name for name, _ in sets):
+        parts.append('  <setlist>\n')
+        parts.extend(_song_elements(setlist, segues, 3))
+        parts.append('  </setlist>\n')
+    else:
+        parts.append('  <setlist>\n')
+        start = 0
+        for name, num_songs in sets:
+            parts.append(f"   <set name={quoteattr(name)}>\n")
+            parts.extend(_song_elements(setlist[start:start + num_songs], segues[start:start + num_songs], 4))
+            parts.append('   </set>\n')
+            start += num_songs
+        parts.append('  </setlist>\n')
+
+    parts.append(SHOW_END)
+    return ''.join(parts)
+
+
+# Streams <show> elements straight to disk instead of building the whole tree in memory.
+# In append mode an existing file is reopened after its last complete show, so a writer
+# that died before writing the footer can just keep going.
+class ShowXMLWriter:
+    def __init__(self, path, append=False):
+        self.path = path
+        self.count = 0
+
+        if append and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            self._seek_to_last_show()
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(XML_HEADER.encode('utf-8'))
+
+    # Drop the footer (or any half-written show) so new shows follow the last complete one
+    def _seek_to_last_show(self):
+        content = self.file.read()
+        end = content.rfind(SHOW_END.encode('utf-8'))
+        if end != -1:
+            end += len(SHOW_END)
+        elif content.startswith(XML_HEADER.encode('utf-8')):
+            end = len(XML_HEADER)
+        else:
+            self.file.seek(0)
+            self.file.write(XML_HEADER.encode('utf-8'))
+            end = len(XML_HEADER)
+
+        self.file.truncate(end)
+        self.file.seek(end)
+
+    def write_show(self, show):
+        self.file.write(format_show(show).encode('utf-8'))
+        self.count += 1
+
+        # Keep what we have on disk in case the crawl dies
+        self.file.flush()
+
+    def write_shows(self, shows):
+        for show in shows:
+            self.write_show(show)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.write(XML_FOOTER.encode('utf-8'))
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()